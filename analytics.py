@@ -0,0 +1,230 @@
+"""Vectorized statistics over the full interaction history"""
+import numpy as np
+
+
+# Response length and citation count per interaction, computed inside SQLite so
+# the citations JSON never has to be decoded in Python
+PROFILE_QUERY = '''
+    SELECT id,
+           COALESCE(length(response_text), 0),
+           CASE WHEN json_valid(citations) THEN json_array_length(citations) ELSE 0 END,
+           COALESCE(substr(timestamp, 1, 10), '')
+    FROM interactions
+    WHERE id > ?
+    ORDER BY id
+'''
+
+PERCENTILES = (50, 90, 99)
+
+
+def merge_value_counts(values_a, counts_a, values_b, counts_b):
+    """Merge two (sorted unique values, counts) frequency tables"""
+    values, inverse = np.unique(np.concatenate([values_a, values_b]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([counts_a, counts_b]), minlength=len(values))
+    return values, counts.astype(np.int64)
+
+
+def weighted_percentiles(values, counts, percentiles=PERCENTILES):
+    """
+    Percentiles of a frequency table, matching np.percentile's default
+    linear interpolation on the expanded data without expanding it.
+    """
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    positions = (total - 1) * np.asarray(percentiles, dtype=float) / 100.0
+    lower = np.floor(positions)
+    upper = np.ceil(positions)
+    lower_values = values[np.searchsorted(cumulative, lower, side='right')]
+    upper_values = values[np.searchsorted(cumulative, upper, side='right')]
+    return lower_values + (upper_values - lower_values) * (positions - lower)
+
+
+def describe(values, counts):
+    """Count, mean, std, min, max and percentiles of a frequency table"""
+    total = int(counts.sum())
+    if not total:
+        return None
+    values = values.astype(float)
+    mean = float(np.dot(values, counts) / total)
+    variance = float(np.dot((values - mean) ** 2, counts) / total)
+    summary = {
+        'count': total,
+        'mean': mean,
+        'std': variance ** 0.5,
+        'min': float(values[0]),
+        'max': float(values[-1]),
+    }
+    for percentile, value in zip(PERCENTILES, weighted_percentiles(values, counts)):
+        summary[f'p{percentile}'] = float(value)
+    return summary
+
+
+def histogram(values, counts, bins=20):
+    """Histogram of a frequency table as {'edges': [...], 'counts': [...]}"""
+    hist_counts, edges = np.histogram(values, bins=bins, weights=counts)
+    return {'edges': edges.tolist(), 'counts': hist_counts.astype(np.int64).tolist()}
+
+
+class InteractionProfile:
+    """
+    Mergeable summary of the interactions table.
+
+    Response lengths and citation counts are kept as frequency tables, so
+    exact percentiles and histograms can be derived at any time and new rows
+    can be folded in without revisiting old ones. Per-day totals are kept
+    alongside. max_id records the last interaction folded in.
+    """
+
+    def __init__(self):
+        self.max_id = 0
+        self.length_values = np.zeros(0, dtype=np.int64)
+        self.length_counts = np.zeros(0, dtype=np.int64)
+        self.citation_values = np.zeros(0, dtype=np.int64)
+        self.citation_counts = np.zeros(0, dtype=np.int64)
+        # day -> [count, length_sum, length_min, length_max, citation_sum, with_citations]
+        self.days = {}
+
+    @property
+    def count(self):
+        return int(self.length_counts.sum())
+
+    def to_dict(self):
+        """JSON-serializable state, restorable with from_dict"""
+        return {
+            'max_id': self.max_id,
+            'length': [self.length_values.tolist(), self.length_counts.tolist()],
+            'citations': [self.citation_values.tolist(), self.citation_counts.tolist()],
+            'days': self.days,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        profile = cls()
+        profile.max_id = state['max_id']
+        profile.length_values = np.array(state['length'][0], dtype=np.int64)
+        profile.length_counts = np.array(state['length'][1], dtype=np.int64)
+        profile.citation_values = np.array(state['citations'][0], dtype=np.int64)
+        profile.citation_counts = np.array(state['citations'][1], dtype=np.int64)
+        profile.days = state['days']
+        return profile
+
+    def update(self, ids, lengths, citations, days):
+        """Fold one chunk of rows (as parallel NumPy arrays) into the profile"""
+        if not len(ids):
+            return
+        self.max_id = max(self.max_id, int(ids.max()))
+
+        values, counts = np.unique(lengths, return_counts=True)
+        self.length_values, self.length_counts = merge_value_counts(
+            self.length_values, self.length_counts, values, counts)
+        values, counts = np.unique(citations, return_counts=True)
+        self.citation_values, self.citation_counts = merge_value_counts(
+            self.citation_values, self.citation_counts, values, counts)
+
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        slots = len(unique_days)
+        day_counts = np.bincount(inverse, minlength=slots)
+        length_sums = np.bincount(inverse, weights=lengths, minlength=slots)
+        citation_sums = np.bincount(inverse, weights=citations, minlength=slots)
+        cited = np.bincount(inverse, weights=citations > 0, minlength=slots)
+        length_mins = np.full(slots, np.iinfo(np.int64).max)
+        length_maxs = np.full(slots, -1)
+        np.minimum.at(length_mins, inverse, lengths)
+        np.maximum.at(length_maxs, inverse, lengths)
+
+        for i, day in enumerate(unique_days.tolist()):
+            chunk = [int(day_counts[i]), int(length_sums[i]), int(length_mins[i]),
+                     int(length_maxs[i]), int(citation_sums[i]), int(cited[i])]
+            existing = self.days.get(day)
+            if existing is None:
+                self.days[day] = chunk
+            else:
+                self.days[day] = [
+                    existing[0] + chunk[0],
+                    existing[1] + chunk[1],
+                    min(existing[2], chunk[2]),
+                    max(existing[3], chunk[3]),
+                    existing[4] + chunk[4],
+                    existing[5] + chunk[5],
+                ]
+
+    def response_length_report(self, bins=20):
+        """Response length statistics in the shape returned by analyze_response_length"""
+        summary = describe(self.length_values, self.length_counts)
+        if summary is None:
+            return None
+        report = {
+            'total_interactions': summary['count'],
+            'avg_response_length': summary['mean'],
+            'min_response_length': int(summary['min']),
+            'max_response_length': int(summary['max']),
+            'std_response_length': summary['std'],
+        }
+        for percentile in PERCENTILES:
+            report[f'p{percentile}_response_length'] = summary[f'p{percentile}']
+        report['histogram'] = histogram(self.length_values, self.length_counts, bins)
+        report['per_day'] = [
+            {
+                'day': day,
+                'count': stats[0],
+                'avg_response_length': stats[1] / stats[0],
+                'min_response_length': stats[2],
+                'max_response_length': stats[3],
+            }
+            for day, stats in sorted(self.days.items())
+        ]
+        return report
+
+    def citation_report(self, bins=20):
+        """Citation statistics in the shape returned by analyze_citation_patterns"""
+        summary = describe(self.citation_values, self.citation_counts)
+        if summary is None:
+            return None
+        with_citations = int(self.citation_counts[self.citation_values > 0].sum())
+        report = {
+            'total_interactions': summary['count'],
+            'interactions_with_citations': with_citations,
+            'percent_with_citations': with_citations / summary['count'] * 100,
+            'avg_citations': summary['mean'],
+            'max_citations': int(summary['max']),
+            'std_citations': summary['std'],
+        }
+        for percentile in PERCENTILES:
+            report[f'p{percentile}_citations'] = summary[f'p{percentile}']
+        # Citation counts are small integers: use one bin per count when they fit
+        max_citations = int(summary['max'])
+        if max_citations + 1 <= bins:
+            bins = np.arange(max_citations + 2)
+        report['histogram'] = histogram(self.citation_values, self.citation_counts, bins)
+        report['per_day'] = [
+            {
+                'day': day,
+                'count': stats[0],
+                'interactions_with_citations': stats[5],
+                'avg_citations': stats[4] / stats[0],
+            }
+            for day, stats in sorted(self.days.items())
+        ]
+        return report
+
+
+def profile_interactions(conn, profile=None, chunk_size=50000):
+    """
+    Fold every interaction with id > profile.max_id into profile (a new one
+    if None), reading chunk_size rows at a time into NumPy arrays.
+    """
+    if profile is None:
+        profile = InteractionProfile()
+    cursor = conn.execute(PROFILE_QUERY, (profile.max_id,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        ids, lengths, citations, days = zip(*rows)
+        profile.update(
+            np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(lengths, dtype=np.int64, count=len(rows)),
+            np.fromiter(citations, dtype=np.int64, count=len(rows)),
+            np.array(days),
+        )
+    return profile
@@ -0,0 +1,128 @@
+"""
+Measure how long the project's modules take to import.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+and the cumulative time of its own import line is taken (best of --repeats
+runs, so disk-cache noise does not count). The storage and analysis modules
+used by cron jobs must stay free of the browser stack and the heavy data
+libraries; importing any of HEAVY_PACKAGES from them fails the run:
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --json imports.json
+    python benchmarks/bench_imports.py --baseline imports.json --tolerance 0.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must import without HEAVY_PACKAGES
+LIGHTWEIGHT_MODULES = (
+    'data_processor', 'bing_chat_cli', 'exporters', 'query_cache', 'tracing', 'html_codec', 'logging_setup',
+)
+HEAVY_PACKAGES = ('selenium', 'pandas', 'PIL', 'bs4', 'lxml', 'numpy', 'pyarrow')
+DEFAULT_MODULES = LIGHTWEIGHT_MODULES + ('analytics', 'reextract', 'bing_chat_scraper')
+
+
+def import_profile(module):
+    """
+    Import module in a fresh interpreter; return ({name: cumulative us} of
+    the modules its import loaded, cumulative us of the module itself).
+    """
+    # Allow bytecode caching so only the first run pays for compiling the sources
+    env = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), len(name) - len(name.lstrip()), int(cumulative)))
+
+    # Children are listed before their parent, indented deeper: walk back from
+    # the module's line to collect only what it pulled in (not interpreter startup)
+    position = next(i for i, entry in enumerate(entries) if entry[0] == module)
+    _, depth, total = entries[position]
+    imported = {}
+    for name, child_depth, cumulative in reversed(entries[:position]):
+        if child_depth <= depth:
+            break
+        imported[name] = cumulative
+    return imported, total
+
+
+def measure(module, repeats):
+    """Best-of-repeats import time of module and the modules it pulls in"""
+    best = None
+    for _ in range(repeats):
+        imported, total = import_profile(module)
+        if best is None or total < best[1]:
+            best = imported, total
+    imported, total = best
+    packages = {name.split('.')[0] for name in imported}
+    slowest = sorted(
+        ((name, us) for name, us in imported.items() if '.' not in name),
+        key=lambda item: -item[1],
+    )[:5]
+    return {
+        'import_ms': total / 1000,
+        'modules': len(imported),
+        'heavy': sorted(package for package in HEAVY_PACKAGES if package in packages),
+        'slowest': [[name, us / 1000] for name, us in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="modules to import")
+    parser.add_argument('--repeats', type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument('--json', metavar='PATH', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against results written with --json")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="allowed relative slowdown against the baseline (default 0.5)")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.repeats) for module in args.modules}
+
+    print(f"{'module':<20} {'import ms':>10} {'modules':>8}  slowest imports")
+    for module, stats in results.items():
+        slowest = ', '.join(f"{name} {ms:.1f}" for name, ms in stats['slowest'][:3])
+        print(f"{module:<20} {stats['import_ms']:>10.1f} {stats['modules']:>8}  {slowest}")
+
+    failures = [
+        f"{module} imports {', '.join(stats['heavy'])}"
+        for module, stats in results.items()
+        if module in LIGHTWEIGHT_MODULES and stats['heavy']
+    ]
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for module, stats in results.items():
+            before = baseline.get(module)
+            if before and stats['import_ms'] > before['import_ms'] * (1 + args.tolerance):
+                failures.append(f"{module}: {before['import_ms']:.1f} -> {stats['import_ms']:.1f} ms")
+
+    if failures:
+        print("\nFailures:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Benchmark the scraper against a local stand-in for the chat page.
+
+Serves benchmarks/chat_page.html over http.server, drives it with the real
+BingChatScraper in headless Chrome and reports, per scraper method, the
+latency and the number of WebDriver round trips it took. Nothing talks to
+Bing, so runs are reproducible and cheap enough to do before every deploy:
+
+    python benchmarks/bench_scraper.py --queries 5 --words 300 --rate 60
+    python benchmarks/bench_scraper.py --json results.json
+    python benchmarks/bench_scraper.py --baseline results.json
+
+With --fake, the same suite runs against fake_webdriver.FakeDriver instead
+of Chrome, with the scraper's sleeps disabled, so only the Python side of
+each method is measured (in microseconds rather than seconds):
+
+    python benchmarks/bench_scraper.py --fake --queries 1000 --repeats 1000
+
+With --baseline, the run fails (exit status 1) when a method's p50 latency
+grows by more than --tolerance or it needs more round trips than before.
+"""
+import argparse
+import functools
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from unittest import mock
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bing_chat_scraper  # noqa: E402
+from bing_chat_scraper import BingChatScraper  # noqa: E402
+from data_processor import percentile  # noqa: E402
+from fake_webdriver import FakeClock, FakeDriver  # noqa: E402
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGE_NAME = 'chat_page.html'
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve the benchmark directory without logging every request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=BENCHMARK_DIR, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_page():
+    """Start a background HTTP server on a free port and return it"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RoundTripCounter:
+    """
+    Count WebDriver commands per scraper phase.
+
+    Every command (including WebElement calls) goes through driver.execute,
+    which is wrapped on the instance; each command is charged to the span_id
+    of the innermost open tracer span, or to None outside any span.
+    """
+
+    def __init__(self, scraper):
+        self.tracer = scraper.tracer
+        self.counts = defaultdict(int)
+        self.total = 0
+        execute = scraper.driver.execute
+
+        @functools.wraps(execute)
+        def counting_execute(*args, **kwargs):
+            stack = self.tracer.stack
+            self.counts[stack[-1]['span_id'] if stack else None] += 1
+            self.total += 1
+            return execute(*args, **kwargs)
+
+        scraper.driver.execute = counting_execute
+
+    def reset(self):
+        counts, self.counts = dict(self.counts), defaultdict(int)
+        self.total = 0
+        return counts
+
+
+class Results:
+    """Latency samples and round-trip counts per method"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.round_trips = defaultdict(list)
+
+    def add(self, method, seconds, round_trips):
+        self.latencies[method].append(seconds * 1000)
+        self.round_trips[method].append(round_trips)
+
+    def summary(self):
+        summary = {}
+        for method, samples in self.latencies.items():
+            ordered = sorted(samples)
+            trips = self.round_trips[method]
+            summary[method] = {
+                'calls': len(samples),
+                'p50_ms': percentile(ordered, 0.5),
+                'p95_ms': percentile(ordered, 0.95),
+                'mean_ms': sum(samples) / len(samples),
+                'round_trips': sum(trips) / len(trips),
+            }
+        return summary
+
+
+def fake_answer(args):
+    """FakeDriver responder producing answers shaped like the stand-in page's"""
+    def respond(query):
+        words = [f"word{i}" for i in range(args.words)]
+        return {
+            'paragraphs': [
+                ' '.join(words[start:start + args.paragraph_words])
+                for start in range(0, len(words), args.paragraph_words)
+            ],
+            'links': [f"https://example.com/source{i}" for i in range(args.links)],
+        }
+    return respond
+
+
+def timed(results, counter, method, function, *args, **kwargs):
+    """Call function once, recording its latency and WebDriver round trips"""
+    counter.reset()
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    results.add(method, time.perf_counter() - start, counter.total)
+    return value
+
+
+def run_queries(scraper, counter, results, queries):
+    """Send queries through send_query, splitting its cost by tracer span"""
+    for i in range(queries):
+        scraper.tracer.drain()
+        counter.reset()
+        start = time.perf_counter()
+        response = scraper.send_query(f"Benchmark question {i + 1}")
+        elapsed = time.perf_counter() - start
+        trips = counter.reset()
+        if not response or not response.get('text'):
+            raise RuntimeError(f"send_query returned no answer for query {i + 1}")
+
+        results.add('send_query', elapsed, sum(trips.values()))
+        # Top-level phases of send_query; round trips of nested spans roll up
+        spans = scraper.tracer.drain()
+        children = {span['span_id']: [] for span in spans}
+        for span in spans:
+            if span['parent_span_id'] in children:
+                children[span['parent_span_id']].append(span)
+
+        def subtree_trips(span):
+            return trips.get(span['span_id'], 0) + sum(subtree_trips(child) for child in children[span['span_id']])
+
+        for span in spans:
+            if span['depth'] == 1:
+                results.add(f"send_query > {span['name']}", span['duration_ms'] / 1000, subtree_trips(span))
+
+
+def run_micro(scraper, counter, results, repeats):
+    """Time the read-only methods against the finished conversation"""
+    for _ in range(repeats):
+        timed(results, counter, 'get_message_count', scraper.get_message_count)
+        timed(results, counter, 'extract_response', scraper.extract_response)
+        timed(results, counter, 'extract_response_per_element', scraper.extract_response_per_element)
+        timed(results, counter, 'find_input_element (cached)', scraper.find_input_element)
+    for _ in range(max(1, repeats // 5)):
+        scraper.invalidate_input_cache()
+        timed(results, counter, 'find_input_element (cold)', scraper.find_input_element)
+
+
+def compare(summary, baseline, tolerance):
+    """Return a list of regressions of summary against a saved baseline"""
+    regressions = []
+    for method, stats in summary.items():
+        before = baseline.get(method)
+        if not before:
+            continue
+        if stats['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{method}: p50 {before['p50_ms']:.3f} -> {stats['p50_ms']:.3f} ms"
+            )
+        if stats['round_trips'] > before['round_trips']:
+            regressions.append(
+                f"{method}: round trips {before['round_trips']:.1f} -> {stats['round_trips']:.1f}"
+            )
+    return regressions
+
+
+def print_table(summary):
+    print(f"{'method':<36} {'calls':>5} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10} {'round trips':>11}")
+    for method, stats in sorted(summary.items(), key=lambda item: -item[1]['p50_ms']):
+        print(
+            f"{method:<36} {stats['calls']:>5} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+            f"{stats['mean_ms']:>10.3f} {stats['round_trips']:>11.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=3, help="queries sent through send_query")
+    parser.add_argument('--repeats', type=int, default=20, help="calls per read-only method")
+    parser.add_argument('--words', type=int, default=120, help="words per answer")
+    parser.add_argument('--rate', type=float, default=40, help="answer words streamed per second")
+    parser.add_argument('--paragraph-words', type=int, default=40, help="words per <p>")
+    parser.add_argument('--first-token-ms', type=int, default=500, help="delay before the answer starts")
+    parser.add_argument('--links', type=int, default=3, help="citation links per answer")
+    parser.add_argument('--completion-mode', choices=('observer', 'poll'), default='observer')
+    parser.add_argument('--human-typing', action='store_true',
+                        help="keep the per-character typing delays (off: the query is typed in one call)")
+    parser.add_argument('--headful', action='store_true', help="show the browser window")
+    parser.add_argument('--fake', action='store_true',
+                        help="use the in-memory FakeDriver with sleeps disabled instead of Chrome")
+    parser.add_argument('--json', metavar='PATH', help="write the summary as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against a summary written with --json")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative p50 slowdown against the baseline (default 0.25)")
+    args = parser.parse_args()
+
+    if args.fake:
+        server = None
+        page = 'https://www.bing.com/chat'
+        driver = FakeDriver.chat_page(respond=fake_answer(args), clock=FakeClock())
+        # The human-emulation pauses would hide the Python-side cost being measured
+        no_sleep = mock.patch.object(bing_chat_scraper, 'time', driver.clock)
+    else:
+        server = serve_page()
+        page = f"http://127.0.0.1:{server.server_port}/{PAGE_NAME}?" + urlencode({
+            'words': args.words,
+            'rate': args.rate,
+            'paragraph_words': args.paragraph_words,
+            'first_token_ms': args.first_token_ms,
+            'links': args.links,
+        })
+        driver = None
+        no_sleep = nullcontext()
+
+    scraper = BingChatScraper(None, None, headless=not args.headful, completion_mode=args.completion_mode,
+                              driver=driver)
+    results = Results()
+    try:
+        if not args.human_typing:
+            # human_type's random delays would dominate send_query; keep its span, drop the sleeps
+            def fast_type(element, text):
+                with scraper.tracer.span('type'):
+                    element.send_keys(text)
+            scraper.human_type = fast_type
+
+        scraper.driver.get(page)
+        counter = RoundTripCounter(scraper)
+        with no_sleep:
+            run_queries(scraper, counter, results, args.queries)
+            run_micro(scraper, counter, results, args.repeats)
+    finally:
+        scraper.close()
+        if server is not None:
+            server.shutdown()
+
+    summary = results.summary()
+    print_table(summary)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Command-line access to a scraped database without starting a browser.
+
+    python bing_chat_cli.py stats
+    python bing_chat_cli.py --db other.db --json stats --quick
+    python bing_chat_cli.py export bing_chat_data.parquet --columns id,query,response_text
+    python bing_chat_cli.py export - --format jsonl | gzip > interactions.jsonl.gz
+    python bing_chat_cli.py search "renewable energy" --limit 5
+    python bing_chat_cli.py reextract --stale-only
+    python bing_chat_cli.py compact --vacuum
+    python bing_chat_cli.py jobs --enqueue queries.txt
+
+Only data_processor is imported, so commands start in milliseconds; NumPy
+and BeautifulSoup are loaded by the commands that need them. Results are
+printed as they are produced. With --json, list results (search hits,
+export -) are JSON Lines and reports are a single JSON object.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+
+from data_processor import DataProcessor, EXPORT_COLUMNS
+from logging_setup import setup_logging
+
+
+class Output:
+    """Print results as human-readable text or, with --json, as JSON"""
+
+    def __init__(self, as_json):
+        self.as_json = as_json
+
+    def record(self, record):
+        """One list item: a JSON line, or key: value pairs on one line"""
+        if self.as_json:
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        else:
+            print("  ".join(f"{key}: {value}" for key, value in record.items()), flush=True)
+
+    def section(self, title, report):
+        """A titled report: printed immediately as text, or collected for the final JSON object"""
+        if self.as_json:
+            return
+        print(f"[{title}]")
+        if not report:
+            print("  (no data)")
+        elif isinstance(report, list):
+            for item in report:
+                print("  " + "  ".join(f"{key}: {format_value(value)}" for key, value in item.items()))
+        else:
+            for key, value in report.items():
+                print(f"  {key}: {format_value(value)}")
+        sys.stdout.flush()
+
+    def report(self, report):
+        """The whole report as one JSON object (no-op in text mode, where sections were printed)"""
+        if self.as_json:
+            print(json.dumps(report, ensure_ascii=False), flush=True)
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def command_stats(processor, args, output):
+    report = {}
+    sections = [
+        ('totals', processor.get_running_stats),
+        ('top_domains', lambda: processor.top_cited_domains(args.domains)),
+        ('phase_latency', processor.timing_summary),
+    ]
+    if not args.quick:
+        # Exact percentiles come from the NumPy profile (cached and updated incrementally)
+        sections += [
+            ('response_length', processor.analyze_response_length),
+            ('citations', processor.analyze_citation_patterns),
+        ]
+    for title, build in sections:
+        section = build()
+        if isinstance(section, dict):
+            section = {key: value for key, value in section.items() if key not in ('id', 'histogram', 'per_day')}
+        report[title] = section
+        output.section(title, section)
+    output.report(report)
+    return 0
+
+
+def command_export(processor, args, output):
+    columns = args.columns.split(',') if args.columns else None
+    if args.filename == '-':
+        # Progress and errors go to stderr, so stdout carries only the rows
+        exported = processor.export(sys.stdout, args.format, columns, args.chunk_size)
+        return 0 if exported is not None else 1
+
+    export = processor.export_incremental if args.incremental else processor.export
+    exported = export(args.filename, args.format, columns, args.chunk_size)
+    if exported is None:
+        return 1
+    report = {'filename': args.filename, 'rows': exported, 'incremental': args.incremental}
+    output.section('export', report)
+    output.report(report)
+    return 0
+
+
+def command_search(processor, args, output):
+    for hit in processor.search(args.text, limit=args.limit, highlight=not args.full, raw=args.raw):
+        output.record(hit)
+    return 0
+
+
+def command_reextract(processor, args, output):
+    report = processor.reextract(workers=args.workers, batch_size=args.batch_size, stale_only=args.stale_only)
+    if report is None:
+        return 1
+    output.section('reextract', report)
+    output.report(report)
+    return 0
+
+
+def command_compact(processor, args, output):
+    report = processor.compact_html(batch_size=args.batch_size, vacuum=args.vacuum)
+    if report is None:
+        return 1
+    output.section('compact', report)
+    output.report(report)
+    return 0
+
+
+def command_jobs(processor, args, output):
+    report = {}
+    if args.enqueue:
+        report['enqueued'] = processor.enqueue_jobs(args.enqueue, max_attempts=args.max_attempts)
+    if args.retry_failed:
+        report['requeued'] = processor.retry_failed_jobs()
+    report.update(processor.job_counts())
+    output.section('jobs', report)
+    output.report(report)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='bing_chat_data.db', help="database file (default: %(default)s)")
+    parser.add_argument('--json', action='store_true', help="machine-readable JSON output")
+    parser.add_argument('--verbose', '-v', action='store_true', help="log progress to stderr")
+    parser.add_argument('--log-file', help="also append the log to this file (default: stderr only)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stats = commands.add_parser('stats', help="aggregate statistics of the stored interactions")
+    stats.add_argument('--quick', action='store_true',
+                       help="running totals only, skipping the percentile analyses")
+    stats.add_argument('--domains', type=int, default=10, help="number of top cited domains")
+    stats.set_defaults(handler=command_stats)
+
+    export = commands.add_parser('export', help="stream interactions to a CSV, JSONL or Parquet file")
+    export.add_argument('filename', help="destination file, or - for stdout")
+    export.add_argument('--format', choices=('csv', 'jsonl', 'parquet'),
+                        help="format (default: from the file extension; JSONL for stdout)")
+    export.add_argument('--columns', help=f"comma-separated columns out of {','.join(EXPORT_COLUMNS)}")
+    export.add_argument('--chunk-size', type=int, default=1000, help="rows read and written at a time")
+    export.add_argument('--incremental', action='store_true',
+                        help="append only rows added since the last export to this file")
+    export.set_defaults(handler=command_export)
+
+    search = commands.add_parser('search', help="full-text search over queries and responses")
+    search.add_argument('text', help="words that must all appear (FTS5 syntax with --raw)")
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--raw', action='store_true', help="pass text to FTS5 unchanged")
+    search.add_argument('--full', action='store_true', help="full response text instead of a snippet")
+    search.set_defaults(handler=command_search)
+
+    reextract = commands.add_parser('reextract', help="regenerate extracted fields from stored HTML")
+    reextract.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    reextract.add_argument('--batch-size', type=int, default=500, help="rows per worker task and transaction")
+    reextract.add_argument('--stale-only', action='store_true',
+                           help="skip rows already processed by the current extractor version")
+    reextract.set_defaults(handler=command_reextract)
+
+    compact = commands.add_parser('compact', help="move inline HTML into compressed blobs")
+    compact.add_argument('--batch-size', type=int, default=500, help="rows converted per transaction")
+    compact.add_argument('--vacuum', action='store_true', help="also shrink the database file")
+    compact.set_defaults(handler=command_compact)
+
+    jobs = commands.add_parser('jobs', help="show or fill the query job queue worked off by the scraper")
+    jobs.add_argument('--enqueue', metavar='FILE', help="add the queries in FILE (one per line) not queued yet")
+    jobs.add_argument('--max-attempts', type=int, default=3, help="tries per enqueued query")
+    jobs.add_argument('--retry-failed', action='store_true', help="give failed jobs one more try")
+    jobs.set_defaults(handler=command_jobs)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"database not found: {args.db}")
+
+    # stderr only by default: cron jobs should not create log files where they run or
+    # write into the scraper's bing_scraper.log
+    setup_logging(log_file=args.log_file, level=logging.INFO if args.verbose else logging.WARNING)
+    # Writes (cached analyses, re-extraction) are applied inline: no writer thread to start
+    with DataProcessor(args.db, write_behind=False) as processor:
+        return args.handler(processor, args, Output(args.json))
+
+
+if __name__ == "__main__":
+    # Exit quietly when output is piped into e.g. head, like other command-line tools
+    if hasattr(signal, 'SIGPIPE'):
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    sys.exit(main())
@@ -1,7 +1,6 @@
 import time
-import json
 import logging
-import pandas as pd
+import argparse
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -17,39 +16,230 @@ from selenium.common.exceptions import (
     ElementClickInterceptedException
 )
 import random
-import re
-from bs4 import BeautifulSoup
-import sqlite3
+import math
 import os
-import base64
-from PIL import Image
-import io
+from tracing import SpanTracer, traced
+from query_cache import QueryCache
+from logging_setup import setup_logging
+# Storage and analysis live in data_processor, which imports without Selenium;
+# DataProcessor is re-exported so existing `from bing_chat_scraper import DataProcessor` keeps working
+from data_processor import DataProcessor, JOB_LEASE_SECONDS, job_owner
 
-# Set up logging with UTF-8 encoding to handle emojis
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bing_scraper.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Named explicitly (not __name__) so levels set per component also apply when run as a script;
+# the per-poll progress of completion detection has its own logger to be turned up or down alone
+logger = logging.getLogger('bing_chat_scraper')
+completion_logger = logging.getLogger('bing_chat_scraper.completion')
+
+# Recorded answers needed in a bucket before its learned window is trusted,
+# and the bounds the learned quiet period is clamped to (seconds)
+ADAPTIVE_MIN_SAMPLES = 5
+ADAPTIVE_MIN_QUIET = 0.5
+ADAPTIVE_MAX_QUIET = 8.0
+# An answer with no text after this many times the learned p95 time to first
+# text (and at least ADAPTIVE_MIN_FIRST_TEXT seconds) is not coming
+ADAPTIVE_FIRST_TEXT_FACTOR = 3
+ADAPTIVE_MIN_FIRST_TEXT = 10.0
+
+# Collects everything extract_response needs from the latest AI message in a
+# single execute_script call instead of one WebDriver round trip per element
+EXTRACT_RESPONSE_JS = r"""
+const messages = document.querySelectorAll('.group\\/ai-message-item');
+if (!messages.length) {
+    return null;
+}
+const latest = messages[messages.length - 1];
+return {
+    paragraphs: Array.from(latest.querySelectorAll('p'), p => p.innerText),
+    links: Array.from(latest.querySelectorAll('a'), a => ({href: a.href, text: a.innerText})),
+    code_blocks: Array.from(latest.querySelectorAll('pre'), pre => pre.innerText),
+    text: latest.innerText,
+    html: latest.outerHTML
+};
+"""
+
+# Installs a MutationObserver that timestamps every change to the AI messages
+# (new messages and edits inside them); idempotent. Changes elsewhere on the
+# page (suggestion chips, the input area, ads) are ignored so they cannot keep
+# the answer from looking settled. With arguments[0] true it also starts a
+# fresh timing record for a new answer: once the answer's first text has
+# appeared, the gap between consecutive changes is collected so completion
+# windows can be learned from history.
+INSTALL_COMPLETION_OBSERVER_JS = r"""
+if (!window.__scraperObserver) {
+    const messageSelector = '.group\\/ai-message-item';
+    const touchesAnswer = mutation => {
+        const target = mutation.target.nodeType === Node.ELEMENT_NODE
+            ? mutation.target : mutation.target.parentElement;
+        if (target && target.closest(messageSelector)) {
+            return true;
+        }
+        return Array.from(mutation.addedNodes).some(node => node.nodeType === Node.ELEMENT_NODE
+            && (node.matches(messageSelector) || node.querySelector(messageSelector) !== null));
+    };
+    window.__scraperLastMutation = Date.now();
+    window.__scraperObserver = new MutationObserver(mutations => {
+        if (!mutations.some(touchesAnswer)) {
+            return;
+        }
+        const now = Date.now();
+        const stats = window.__scraperStats;
+        if (stats && stats.firstTextAt !== null && stats.gaps.length < 10000) {
+            stats.gaps.push(now - window.__scraperLastMutation);
+        }
+        window.__scraperLastMutation = now;
+    });
+    window.__scraperObserver.observe(document.body, {
+        childList: true, subtree: true, characterData: true
+    });
+}
+if (arguments[0] || !window.__scraperStats) {
+    window.__scraperStats = {started: Date.now(), firstTextAt: null, gaps: []};
+}
+return true;
+"""
+
+# Async script: resolves with {settled, length, first_text_ms, gaps_ms} once the
+# AI messages have been quiet for quietMs with no typing indicator and a
+# non-empty latest AI message, or with settled=false after maxWaitMs.
+# Arguments: quietMs, maxWaitMs, expectedMessages.
+WAIT_FOR_SETTLED_JS = r"""
+const [quietMs, maxWaitMs, expectedMessages, done] = arguments;
+const started = Date.now();
+const stats = window.__scraperStats;
+const typingSelector = "[class*='typing'], [class*='loading'], [class*='generating'], .animate-pulse";
+
+function latestText() {
+    const messages = document.querySelectorAll('.group\\/ai-message-item');
+    if (!messages.length) {
+        return '';
+    }
+    const paragraphs = messages[messages.length - 1].querySelectorAll('p');
+    return Array.from(paragraphs, p => p.innerText).join(' ').trim();
+}
+
+function messageCount() {
+    return document.querySelectorAll("[data-content='user-message']").length
+        + document.querySelectorAll('.group\\/ai-message-item').length;
+}
+
+function finish(settled, text) {
+    done({
+        settled: settled,
+        length: text.length,
+        first_text_ms: stats.firstTextAt === null ? null : stats.firstTextAt - stats.started,
+        gaps_ms: stats.gaps
+    });
+}
+
+function check() {
+    const now = Date.now();
+    const text = latestText();
+    const arrived = text.length > 0 && messageCount() >= expectedMessages;
+    if (arrived && stats.firstTextAt === null) {
+        stats.firstTextAt = now;
+    }
+    const ready = arrived && document.querySelector(typingSelector) === null;
+    const quietFor = now - window.__scraperLastMutation;
+    if (ready && quietFor >= quietMs) {
+        finish(true, text);
+        return;
+    }
+    if (now - started >= maxWaitMs) {
+        finish(false, text);
+        return;
+    }
+    // Sleep until the quiet period could have elapsed; re-check sooner while not ready
+    setTimeout(check, ready ? Math.max(quietMs - quietFor, 10) : 100);
+}
+
+check();
+"""
+
+# Snapshot used by send_query_stream: the latest AI message text (joined the way
+# extract_response joins it), whether a typing indicator is shown and the
+# total message count
+STREAM_STATE_JS = r"""
+const messages = document.querySelectorAll('.group\\/ai-message-item');
+const latest = messages.length ? messages[messages.length - 1] : null;
+const paragraphs = latest ? Array.from(latest.querySelectorAll('p'), p => p.innerText.trim()) : [];
+return {
+    text: paragraphs.filter(text => text).join('\n'),
+    typing: document.querySelector(
+        "[class*='typing'], [class*='loading'], [class*='generating'], .animate-pulse") !== null,
+    count: messages.length + document.querySelectorAll("[data-content='user-message']").length
+};
+"""
+
+# Revalidates a cached chat input in one call: returns true (after scrolling it
+# into view and focusing it) if it is still attached, visible and enabled
+FOCUS_INPUT_ELEMENT_JS = r"""
+const element = arguments[0];
+if (!element || !element.isConnected || element.disabled || !element.getClientRects().length) {
+    return false;
+}
+element.scrollIntoView({block: 'center'});
+element.focus();
+return true;
+"""
+
+# Resolves a cached input selector in one call: the first visible, enabled
+# match (scrolled into view and focused), or null
+RESOLVE_INPUT_SELECTOR_JS = r"""
+for (const element of document.querySelectorAll(arguments[0])) {
+    if (!element.disabled && element.getClientRects().length) {
+        element.scrollIntoView({block: 'center'});
+        element.focus();
+        return element;
+    }
+}
+return null;
+"""
+
+class StreamRewrite:
+    """
+    Yielded by send_query_stream when the page rewrote text it had already
+    shown: text is the whole answer so far and replaces what was streamed.
+    Deliberately not a str, so code that only concatenates deltas fails
+    loudly instead of building corrupted text.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"StreamRewrite({self.text!r})"
 
-# Set console to handle UTF-8 for Windows
-import sys
-if sys.platform.startswith('win'):
-    import os
-    os.system('chcp 65001 >nul 2>&1')  # Set Windows console to UTF-8
 
 class BingChatScraper:
-    def __init__(self, username, password, headless=False, verification_timeout=30):
+    def __init__(self, username, password, headless=False, verification_timeout=30,
+                 completion_mode='observer', quiet_period=1.0, data_processor=None,
+                 adaptive_completion=True, driver=None, query_cache=None):
         self.username = username
         self.password = password
         self.headless = headless
         self.verification_timeout = verification_timeout
-        self.driver = None
+        # 'observer' waits on an in-page MutationObserver; 'poll' uses the 2-second poller
+        self.completion_mode = completion_mode
+        self.quiet_period = quiet_period
+        # With a DataProcessor attached, completion timings are recorded and
+        # (if adaptive_completion) used to size the completion window per query
+        self.data_processor = data_processor
+        self.adaptive_completion = adaptive_completion
+        self.last_completion_stats = {}
+        # Chat input found by find_input_element, reused across queries
+        self.input_selector = None
+        self.input_element = None
+        # Optional QueryCache answering repeated prompts without the browser
+        self.query_cache = query_cache
+        # Per-phase timing spans of login and send_query; drain() them for storage
+        self.tracer = SpanTracer()
+        # An injected driver (e.g. fake_webdriver.FakeDriver) is used as-is instead of launching Chrome
+        self.driver = driver
         self.wait = None
-        self.setup_driver()
+        if driver is None:
+            self.setup_driver()
+        else:
+            self.wait = WebDriverWait(self.driver, 20)
         
     def setup_driver(self):
         """Set up Chrome driver with appropriate options to mimic human behavior"""
@@ -77,6 +267,7 @@ class BingChatScraper:
         })
         self.wait = WebDriverWait(self.driver, 20)
         
+    @traced('verification_check')
     def check_for_human_verification(self):
         """Check if human verification is required and handle it"""
         """
@@ -103,7 +294,7 @@ class BingChatScraper:
                     for element in elements:
                         # Check if it's a verification checkbox
                         if self.is_verification_element(element):
-                            logging.warning("Human verification required")
+                            logger.warning("Human verification required")
                             return True
                 except:
                     continue
@@ -114,7 +305,7 @@ class BingChatScraper:
                 try:
                     src = iframe.get_attribute("src") or ""
                     if any(term in src for term in ['captcha', 'verify', 'challenge']):
-                        logging.warning("Verification iframe detected")
+                        logger.warning("Verification iframe detected")
                         return True
                 except:
                     continue
@@ -122,7 +313,7 @@ class BingChatScraper:
             return False
             
         except Exception as e:
-            logging.error(f"Error checking for verification: {str(e)}")
+            logger.error(f"Error checking for verification: {str(e)}")
             return False
     
     def is_verification_element(self, element):
@@ -156,6 +347,7 @@ class BingChatScraper:
         except:
             return False
     
+    @traced('verification_handle')
     def handle_human_verification(self):
         """Handle human verification if required"""
         """
@@ -181,7 +373,7 @@ class BingChatScraper:
                         elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                         for element in elements:
                             if self.is_verification_element(element) and element.is_displayed():
-                                logging.info("Found verification checkbox, attempting to click")
+                                logger.info("Found verification checkbox, attempting to click")
                                 
                                 # Scroll to the element
                                 self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
@@ -190,13 +382,13 @@ class BingChatScraper:
                                 # Try to click the element
                                 try:
                                     element.click()
-                                    logging.info("Clicked verification checkbox")
+                                    logger.info("Clicked verification checkbox")
                                     time.sleep(3)
                                     return True
                                 except (ElementNotInteractableException, ElementClickInterceptedException):
                                     # Try JavaScript click as fallback
                                     self.driver.execute_script("arguments[0].click();", element)
-                                    logging.info("Used JavaScript to click verification checkbox")
+                                    logger.info("Used JavaScript to click verification checkbox")
                                     time.sleep(3)
                                     return True
                     except:
@@ -208,7 +400,7 @@ class BingChatScraper:
                     try:
                         src = iframe.get_attribute("src") or ""
                         if any(term in src for term in ['captcha', 'verify']):
-                            logging.warning("CAPTCHA verification detected. Manual intervention may be required.")
+                            logger.warning("CAPTCHA verification detected. Manual intervention may be required.")
                             # Take screenshot for debugging
                             self.driver.save_screenshot("captcha_verification.png")
                             return False
@@ -218,33 +410,35 @@ class BingChatScraper:
                 time.sleep(2)
                 
             except Exception as e:
-                logging.error(f"Error handling verification: {str(e)}")
+                logger.error(f"Error handling verification: {str(e)}")
                 time.sleep(2)
         
-        logging.error("Verification handling timeout")
+        logger.error("Verification handling timeout")
         return False
     
+    @traced('login')
     def login(self):
         """Log in to Bing Chat with provided credentials"""
         try:
-            logging.info("Navigating to Bing Chat...")
-            self.driver.get("https://www.bing.com/chat")
+            logger.info("Navigating to Bing Chat...")
+            with self.tracer.span('navigate'):
+                self.driver.get("https://www.bing.com/chat")
             time.sleep(3)
             
             # Check for human verification before proceeding
             if self.check_for_human_verification():
                 if not self.handle_human_verification():
-                    logging.error("Failed to complete human verification")
+                    logger.error("Failed to complete human verification")
                     return False
             
             # Check if already logged in
             current_url = self.driver.current_url.lower()
             if "login" not in current_url and "signin" not in current_url:
-                logging.info("Already logged in or on chat page")
+                logger.info("Already logged in or on chat page")
                 return True
                 
             # Wait for and click the sign-in button
-            logging.info("Looking for sign-in button...")
+            logger.info("Looking for sign-in button...")
             try:
                 sign_in_button = self.wait.until(
                     EC.element_to_be_clickable((By.ID, "id_a"))
@@ -272,11 +466,11 @@ class BingChatScraper:
             time.sleep(2)
             if self.check_for_human_verification():
                 if not self.handle_human_verification():
-                    logging.error("Failed to complete human verification after sign-in")
+                    logger.error("Failed to complete human verification after sign-in")
                     return False
             
             # Wait for login form and enter credentials
-            logging.info("Waiting for login form...")
+            logger.info("Waiting for login form...")
             username_field = self.wait.until(
                 EC.visibility_of_element_located((By.NAME, "loginfmt"))
             )
@@ -289,7 +483,7 @@ class BingChatScraper:
             time.sleep(2)
             if self.check_for_human_verification():
                 if not self.handle_human_verification():
-                    logging.error("Failed to complete human verification after username")
+                    logger.error("Failed to complete human verification after username")
                     return False
             
             # Wait for password field
@@ -305,7 +499,7 @@ class BingChatScraper:
             time.sleep(2)
             if self.check_for_human_verification():
                 if not self.handle_human_verification():
-                    logging.error("Failed to complete human verification after password")
+                    logger.error("Failed to complete human verification after password")
                     return False
             
             # Handle "Stay signed in" prompt if it appears
@@ -320,7 +514,7 @@ class BingChatScraper:
             time.sleep(3)
             if self.check_for_human_verification():
                 if not self.handle_human_verification():
-                    logging.error("Failed to complete final human verification")
+                    logger.error("Failed to complete final human verification")
                     return False
                 
             # Wait for chat interface to load
@@ -329,25 +523,32 @@ class BingChatScraper:
                     EC.presence_of_element_located((By.CSS_SELECTOR, "textarea, input[type='text'], [contenteditable='true']"))
                 )
             except TimeoutException:
-                logging.warning("Chat interface not found, but continuing anyway")
+                logger.warning("Chat interface not found, but continuing anyway")
             
-            logging.info("Login successful!")
+            logger.info("Login successful!")
             return True
             
         except Exception as e:
-            logging.error(f"Login failed: {str(e)}")
+            logger.error(f"Login failed: {str(e)}")
             # Take screenshot for debugging
             self.driver.save_screenshot("login_error.png")
             return False
     
+    @traced('type')
     def human_type(self, element, text):
         """Type text in a human-like manner with random delays"""
         for character in text:
             element.send_keys(character)
             time.sleep(random.uniform(0.05, 0.3))  # Random typing speed
     
+    @traced('find_input')
     def find_input_element(self):
         """Find the chat input element using multiple strategies"""
+        # Repeat queries in the same session reuse the element or selector that worked last time
+        cached_element = self.cached_input_element()
+        if cached_element is not None:
+            return cached_element
+        
         input_selectors = [
             "textarea[placeholder*='Ask me anything']",
             "textarea[aria-label*='Ask me anything']",
@@ -374,7 +575,9 @@ class BingChatScraper:
                             element.click()
                             time.sleep(0.5)
                             
-                            logging.info(f"Found input element using selector: {selector}")
+                            logger.info(f"Found input element using selector: {selector}")
+                            self.input_selector = selector
+                            self.input_element = element
                             return element
                         except:
                             continue
@@ -383,41 +586,85 @@ class BingChatScraper:
         
         return None
     
-    def send_query(self, query):
-        """Send a query to Bing Chat and wait for response"""
+    def cached_input_element(self):
+        """
+        Revalidate the cached chat input with a single script call.
+
+        The cached element is checked (attached, visible, enabled) and focused
+        in one round trip; if it went stale, the cached selector is resolved
+        again in one round trip. Returns None when neither works, in which
+        case the full selector search runs.
+        """
         try:
-            logging.info(f"Sending query: {query}")
-            
-            # Check for human verification before sending query
-            if self.check_for_human_verification():
-                if not self.handle_human_verification():
-                    logging.error("Verification required before sending query")
-                    return None
-            
-            # Wait a bit for any dynamic content to load
-            time.sleep(3)
-            
-            # Get the count of existing messages before sending
-            initial_message_count = self.get_message_count()
-            
-            # Find the chat input element with retries
-            chat_input = None
-            for attempt in range(3):
-                chat_input = self.find_input_element()
-                if chat_input:
-                    break
-                logging.warning(f"Input element not found, attempt {attempt + 1}/3")
-                time.sleep(2)
-                
-            if not chat_input:
-                raise Exception("Could not find chat input element after multiple attempts")
-            
-            # Wait for element to be fully interactive
-            time.sleep(1)
+            if self.input_element is not None:
+                if self.driver.execute_script(FOCUS_INPUT_ELEMENT_JS, self.input_element):
+                    logger.debug("Reusing cached input element")
+                    return self.input_element
+                self.input_element = None
+            
+            if self.input_selector is not None:
+                element = self.driver.execute_script(RESOLVE_INPUT_SELECTOR_JS, self.input_selector)
+                if element is not None:
+                    logger.debug(f"Re-resolved cached input selector: {self.input_selector}")
+                    self.input_element = element
+                    return element
+        except StaleElementReferenceException:
+            self.input_element = None
+            return self.cached_input_element()
+        except Exception as e:
+            logger.debug(f"Cached input element unusable: {str(e)}")
+        
+        self.invalidate_input_cache()
+        return None
+    
+    def invalidate_input_cache(self):
+        """Forget the cached chat input so the next lookup searches from scratch"""
+        self.input_selector = None
+        self.input_element = None
+    
+    @traced('submit_query')
+    def submit_query(self, query):
+        """
+        Type and send a query (the part of send_query before waiting for the answer).
+
+        Returns the message count from before sending, or None if human
+        verification blocked the query. Raises if the query could not be sent.
+        """
+        logger.info(f"Sending query: {query}")
+        
+        # Check for human verification before sending query
+        if self.check_for_human_verification():
+            if not self.handle_human_verification():
+                logger.error("Verification required before sending query")
+                return None
+        
+        # Wait a bit for any dynamic content to load
+        time.sleep(3)
+        
+        # Get the count of existing messages before sending
+        initial_message_count = self.get_message_count()
+        
+        # Find the chat input element with retries
+        chat_input = None
+        for attempt in range(3):
+            chat_input = self.find_input_element()
+            if chat_input:
+                break
+            logger.warning(f"Input element not found, attempt {attempt + 1}/3")
+            time.sleep(2)
             
+        if not chat_input:
+            raise Exception("Could not find chat input element after multiple attempts")
+        
+        # Wait for element to be fully interactive
+        time.sleep(1)
+        
+        try:
             # Clear any existing text
             try:
                 chat_input.clear()
+            except StaleElementReferenceException:
+                raise
             except:
                 # Try alternative clearing methods
                 chat_input.send_keys(Keys.CONTROL + "a")
@@ -425,85 +672,185 @@ class BingChatScraper:
             
             # Type the query in a human-like manner
             self.human_type(chat_input, query)
-            time.sleep(1)
-            
-            # Send the query - try multiple methods
-            query_sent = False
-            
-            # Method 1: Enter key
-            try:
-                chat_input.send_keys(Keys.RETURN)
-                query_sent = True
-                logging.info("Query sent using Enter key")
-            except:
-                logging.warning("Enter key failed, trying send button")
-            
-            # Method 2: Send button if Enter failed
-            if not query_sent:
-                send_button_selectors = [
-                    "button[aria-label*='Send']",
-                    "button[title*='Send']",
-                    "button[data-testid*='send']",
-                    "button svg[data-icon='send']",
-                    "[role='button'][aria-label*='Send']"
-                ]
-                
-                for selector in send_button_selectors:
-                    try:
-                        send_button = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if send_button.is_displayed() and send_button.is_enabled():
-                            send_button.click()
-                            query_sent = True
-                            logging.info("Query sent using send button")
-                            break
-                    except:
-                        continue
-            
-            if not query_sent:
-                raise Exception("Failed to send query using any method")
-            
-            # Wait for new message to appear (indicating query was sent successfully)
-            message_appeared = self.wait_for_new_message(initial_message_count, timeout=15)
-            
-            if not message_appeared:
-                logging.warning("New message did not appear, but continuing...")
-            else:
-                logging.info("Query sent, waiting for response...")
+        except StaleElementReferenceException:
+            # The page re-rendered the input: search for it again next time
+            self.invalidate_input_cache()
+            raise
+        time.sleep(1)
+        
+        # Send the query - try multiple methods
+        query_sent = False
+        
+        # Method 1: Enter key
+        try:
+            chat_input.send_keys(Keys.RETURN)
+            query_sent = True
+            logger.info("Query sent using Enter key")
+        except:
+            logger.warning("Enter key failed, trying send button")
+        
+        # Method 2: Send button if Enter failed
+        if not query_sent:
+            send_button_selectors = [
+                "button[aria-label*='Send']",
+                "button[title*='Send']",
+                "button[data-testid*='send']",
+                "button svg[data-icon='send']",
+                "[role='button'][aria-label*='Send']"
+            ]
             
-            # Check for human verification after sending query
-            time.sleep(2)
-            if self.check_for_human_verification():
-                if not self.handle_human_verification():
-                    logging.error("Verification required after sending query")
-                    return None
+            for selector in send_button_selectors:
+                try:
+                    send_button = self.driver.find_element(By.CSS_SELECTOR, selector)
+                    if send_button.is_displayed() and send_button.is_enabled():
+                        send_button.click()
+                        query_sent = True
+                        logger.info("Query sent using send button")
+                        break
+                except:
+                    continue
+        
+        if not query_sent:
+            raise Exception("Failed to send query using any method")
+        
+        # Wait for new message to appear (indicating query was sent successfully)
+        message_appeared = self.wait_for_new_message(initial_message_count, timeout=15)
+        
+        if not message_appeared:
+            logger.warning("New message did not appear, but continuing...")
+        else:
+            logger.info("Query sent, waiting for response...")
+        
+        # Check for human verification after sending query
+        time.sleep(2)
+        if self.check_for_human_verification():
+            if not self.handle_human_verification():
+                logger.error("Verification required after sending query")
+                return None
+        
+        return initial_message_count
+    
+    @traced('send_query')
+    def send_query(self, query, bypass_cache=False, cache_ttl=None):
+        """
+        Send a query to Bing Chat and wait for response.
+
+        With a query cache attached, a response cached for the same prompt
+        within cache_ttl seconds (default: the cache's ttl) is returned
+        instead, marked with 'cached': True. bypass_cache skips the lookup
+        but still caches the fresh answer.
+        """
+        if self.query_cache is not None and not bypass_cache:
+            cached = self.query_cache.get(query, ttl=cache_ttl)
+            if cached is not None:
+                logger.info(f"Answered from query cache: {len(cached['text'])} characters")
+                cached['cached'] = True
+                return cached
+        
+        try:
+            initial_message_count = self.submit_query(query)
+            if initial_message_count is None:
+                return None
             
             # Wait for response to complete
-            response_complete = self.wait_for_response_completion()
+            response_complete = self.wait_for_response_completion(
+                initial_message_count=initial_message_count, query_length=len(query)
+            )
             
             if not response_complete:
-                logging.warning("Response may not be complete, but continuing...")
+                logger.warning("Response may not be complete, but continuing...")
             
             # Check for human verification after response
             if self.check_for_human_verification():
-                logging.warning("Verification required after response")
+                logger.warning("Verification required after response")
                 # Continue anyway to extract the response
             
             # Extract the response
             response = self.extract_response()
             
             if response and response.get('text'):
-                logging.info(f"Response received: {len(response['text'])} characters")
+                logger.info(f"Response received: {len(response['text'])} characters")
+                if self.query_cache is not None:
+                    self.query_cache.put(query, response)
             else:
-                logging.warning("No response text found")
+                logger.warning("No response text found")
             
             return response
             
         except Exception as e:
-            logging.error(f"Error sending query: {str(e)}")
+            logger.error(f"Error sending query: {str(e)}")
             # Take screenshot for debugging
             self.driver.save_screenshot(f"query_error_{int(time.time())}.png")
             return None
     
+    def send_query_stream(self, query, poll_interval=0.25, timeout=120):
+        """
+        Send a query and yield the answer while it is being generated.
+
+        Yields str deltas as the latest AI message grows, then, once the
+        answer has settled (no typing indicator and no change for
+        quiet_period seconds), the same dict send_query would return (None if
+        nothing could be extracted). The deltas concatenate to the streamed
+        text. If the page rewrites text it already showed, a StreamRewrite
+        carrying the whole current text is yielded instead of a delta: it
+        replaces everything streamed so far, and later deltas append to it.
+        Yields nothing if the query is blocked.
+        """
+        try:
+            initial_message_count = self.submit_query(query)
+        except Exception as e:
+            logger.error(f"Error sending query: {str(e)}")
+            self.driver.save_screenshot(f"query_error_{int(time.time())}.png")
+            return
+        if initial_message_count is None:
+            return
+        
+        expected_messages = initial_message_count + 2
+        window = self.completion_window(len(query), timeout)
+        quiet_period = window['quiet_period']
+        emitted = ""
+        started = last_change = time.time()
+        deadline = started + timeout
+        
+        while time.time() < deadline:
+            if not emitted and window['first_text_timeout'] is not None \
+                    and time.time() - started >= window['first_text_timeout']:
+                logger.warning(f"No response text after {window['first_text_timeout']:.0f}s, giving up")
+                break
+            try:
+                state = self.driver.execute_script(STREAM_STATE_JS)
+            except Exception as e:
+                logger.warning(f"Error reading streamed response: {str(e)}")
+                time.sleep(poll_interval)
+                continue
+            
+            text = state['text'] if state['count'] >= expected_messages else ""
+            if text and text != emitted:
+                if text.startswith(emitted):
+                    update = text[len(emitted):]
+                else:
+                    update = StreamRewrite(text)
+                    logger.debug("Streamed text was rewritten, resending it whole")
+                emitted = text
+                last_change = time.time()
+                yield update
+            elif emitted and not state['typing'] and time.time() - last_change >= quiet_period:
+                break
+            
+            time.sleep(poll_interval)
+        else:
+            logger.warning("Response timeout reached, but may still have partial response")
+        
+        if self.check_for_human_verification():
+            logger.warning("Verification required after response")
+        
+        response = self.extract_response()
+        if response and response.get('text'):
+            logger.info(f"Response received: {len(response['text'])} characters")
+        else:
+            logger.warning("No response text found")
+        yield response
+    
     def get_message_count(self):
         """Get the current count of messages in the chat"""
         try:
@@ -516,6 +863,7 @@ class BingChatScraper:
         except:
             return 0
     
+    @traced('wait_for_new_message')
     def wait_for_new_message(self, initial_count, timeout=10):
         """Wait for a new message to appear in the chat"""
         start_time = time.time()
@@ -530,19 +878,177 @@ class BingChatScraper:
                 time.sleep(1)
                 continue
         
-        logging.warning("Timeout waiting for new message to appear")
+        logger.warning("Timeout waiting for new message to appear")
         return False
     
-    def wait_for_response_completion(self, timeout=120):
+    @traced('generation')
+    def wait_for_response_completion(self, timeout=120, initial_message_count=None, query_length=None):
         """Wait for the AI response to be fully generated"""
+        window = self.completion_window(query_length, timeout)
+        started = time.time()
+        complete = None
+        
+        if self.completion_mode == 'observer':
+            complete = self.wait_for_response_completion_observer(
+                window['timeout'], initial_message_count, quiet_period=window['quiet_period'],
+                first_text_timeout=window['first_text_timeout']
+            )
+            if complete is None:
+                completion_logger.warning("Observer-based completion detection failed, falling back to polling")
+        if complete is None:
+            complete = self.wait_for_response_completion_polling(
+                window['timeout'], poll_interval=window['poll_interval'], stable_polls=window['stable_polls'],
+                first_text_timeout=window['first_text_timeout']
+            )
+        
+        stats = self.last_completion_stats
+        first_token = stats.get('first_token_seconds')
+        completion_logger.info(
+            f"Completion {'settled' if complete else 'timed out'} after {time.time() - started:.2f}s "
+            f"(window from {window['source']}, first text after "
+            f"{f'{first_token:.2f}s' if first_token is not None else 'never'})"
+        )
+        if self.data_processor is not None and query_length is not None:
+            self.data_processor.record_response_timing(
+                query_length, stats.get('first_token_seconds'), time.time() - started,
+                stats.get('gaps', []), stats.get('mode'), complete
+            )
+        return complete
+    
+    def completion_window(self, query_length=None, timeout=120):
+        """
+        Choose the quiet period, poll interval and timeout for one answer.
+
+        With a data processor attached, the window is learned from recorded
+        answers to queries of similar length: the quiet period covers the
+        95th percentile of the longest pause between updates within an
+        answer, the timeout leaves room for the slowest recorded answers, and
+        first_text_timeout gives up early on an answer whose first text is
+        far later than the recorded time to first text (no limit by
+        default). Otherwise, or with too little history, the configured
+        defaults apply.
+        """
+        window = {
+            'quiet_period': self.quiet_period,
+            'poll_interval': 2.0,
+            'stable_polls': 5,
+            'timeout': timeout,
+            'first_text_timeout': None,
+            'source': 'defaults',
+        }
+        if not self.adaptive_completion or self.data_processor is None or query_length is None:
+            return window
+        
+        history = self.data_processor.response_timing_stats(query_length)
+        if not history or history['samples'] < ADAPTIVE_MIN_SAMPLES:
+            return window
+        
+        quiet_period = min(max(history['max_gap_p95'] * 1.5, ADAPTIVE_MIN_QUIET), ADAPTIVE_MAX_QUIET)
+        poll_interval = min(max(quiet_period / 3, 0.25), 2.0)
+        window.update({
+            'quiet_period': quiet_period,
+            'poll_interval': poll_interval,
+            'stable_polls': max(math.ceil(quiet_period / poll_interval), 2),
+            'timeout': max(timeout, history['total_p95'] * 2),
+            'source': f"{history['samples']} answers in query-length bucket {history['bucket']}",
+        })
+        if history['first_token_p95'] is not None:
+            window['first_text_timeout'] = min(
+                max(history['first_token_p95'] * ADAPTIVE_FIRST_TEXT_FACTOR, ADAPTIVE_MIN_FIRST_TEXT),
+                window['timeout'],
+            )
+        first_text = window['first_text_timeout']
+        completion_logger.info(
+            f"Adaptive completion window: quiet {quiet_period:.2f}s, poll {poll_interval:.2f}s, "
+            f"first text within {f'{first_text:.0f}s' if first_text is not None else 'the timeout'}, "
+            f"timeout {window['timeout']:.0f}s ({window['source']})"
+        )
+        return window
+    
+    def wait_for_response_completion_observer(self, timeout=120, initial_message_count=None, slice_seconds=20,
+                                              quiet_period=None, first_text_timeout=None):
+        """
+        Wait until the page has been quiet for quiet_period seconds.
+
+        A MutationObserver injected into the page timestamps every DOM change,
+        and an async script resolves as soon as no change has happened for the
+        quiet period, no typing indicator is shown and the latest AI message
+        has text. The wait runs in slices of slice_seconds so a navigation or
+        a hung page never blocks longer than one slice. Returns True when
+        settled, False on timeout (or when no text has appeared within
+        first_text_timeout seconds) and None if the scripts cannot run here.
+        """
+        # The new exchange adds a user message and an AI message
+        expected_messages = initial_message_count + 2 if initial_message_count is not None else 0
+        quiet_ms = int((quiet_period or self.quiet_period) * 1000)
+        started = time.time()
+        deadline = started + timeout
+        first_slice = True
+        state = None
+        
+        completion_logger.info("Waiting for response to complete...")
+        
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if first_text_timeout is not None and (state or {}).get('first_text_ms') is None:
+                    first_text_remaining = started + first_text_timeout - time.time()
+                    if first_text_remaining <= 0:
+                        completion_logger.warning(f"No response text after {first_text_timeout:.0f}s, giving up")
+                        return False
+                    remaining = min(remaining, first_text_remaining)
+                if remaining <= 0:
+                    break
+                slice_ms = int(min(remaining, slice_seconds) * 1000)
+                # Re-installing is a no-op unless the page navigated and lost the observer
+                self.driver.execute_script(INSTALL_COMPLETION_OBSERVER_JS, first_slice)
+                first_slice = False
+                self.driver.set_script_timeout(slice_ms / 1000 + 5)
+                state = self.driver.execute_async_script(
+                    WAIT_FOR_SETTLED_JS, quiet_ms, slice_ms, expected_messages
+                )
+                if state and state.get('settled'):
+                    completion_logger.info(f"Response appears to be complete ({state.get('length')} characters)")
+                    return True
+                completion_logger.debug(f"Response not settled yet: {state}")
+        except Exception as e:
+            completion_logger.warning(f"Error waiting for response with observer: {str(e)}")
+            return None
+        finally:
+            state = state or {}
+            self.last_completion_stats = {
+                'mode': 'observer',
+                'first_token_seconds': (
+                    state['first_text_ms'] / 1000 if state.get('first_text_ms') is not None else None
+                ),
+                'gaps': [gap / 1000 for gap in state.get('gaps_ms') or []],
+            }
+        
+        completion_logger.warning("Response timeout reached, but may still have partial response")
+        return False
+    
+    def wait_for_response_completion_polling(self, timeout=120, poll_interval=2.0, stable_polls=5,
+                                             first_text_timeout=None):
+        """
+        Wait for the AI response to be fully generated by polling every
+        poll_interval seconds, giving up early if no text has appeared within
+        first_text_timeout seconds
+        """
         start_time = time.time()
-        last_change = time.time()
+        last_change = None
+        first_text_at = None
+        gaps = []
         last_text = ""
         stable_count = 0
+        self.last_completion_stats = {'mode': 'poll', 'first_token_seconds': None, 'gaps': gaps}
         
-        logging.info("Waiting for response to complete...")
+        completion_logger.info("Waiting for response to complete...")
         
         while time.time() - start_time < timeout:
+            if first_text_at is None and first_text_timeout is not None \
+                    and time.time() - start_time >= first_text_timeout:
+                completion_logger.warning(f"No response text after {first_text_timeout:.0f}s, giving up")
+                return False
             try:
                 # Check for typing indicators
                 typing_indicators = self.driver.find_elements(By.CSS_SELECTOR, 
@@ -551,14 +1057,14 @@ class BingChatScraper:
                 if typing_indicators:
                     # Reset stable count if typing indicators are present
                     stable_count = 0
-                    time.sleep(2)
+                    time.sleep(poll_interval)
                     continue
                 
                 # Get current response text from the latest AI message
                 ai_messages = self.driver.find_elements(By.CSS_SELECTOR, ".group\\/ai-message-item")
                 
                 if not ai_messages:
-                    time.sleep(2)
+                    time.sleep(poll_interval)
                     continue
                 
                 # Get the latest AI message
@@ -570,40 +1076,90 @@ class BingChatScraper:
                 
                 # Check if text has changed
                 if current_text != last_text and current_text.strip():
+                    now = time.time()
+                    if first_text_at is None:
+                        first_text_at = now
+                        self.last_completion_stats['first_token_seconds'] = now - start_time
+                    else:
+                        gaps.append(now - last_change)
                     last_text = current_text
-                    last_change = time.time()
+                    last_change = now
                     stable_count = 0
-                    logging.debug(f"Response text updated, length: {len(current_text)}")
+                    completion_logger.debug(f"Response text updated, length: {len(current_text)}")
                 else:
                     stable_count += 1
                 
                 # If text hasn't changed for multiple checks, consider it complete
-                if stable_count >= 5 and current_text.strip():
-                    logging.info("Response appears to be complete")
+                if stable_count >= stable_polls and current_text.strip():
+                    completion_logger.info("Response appears to be complete")
                     return True
                 
-                time.sleep(2)
+                time.sleep(poll_interval)
                 
             except StaleElementReferenceException:
                 # Element became stale, continue to refresh our reference
-                time.sleep(2)
+                time.sleep(poll_interval)
                 continue
             except Exception as e:
-                logging.warning(f"Error waiting for response: {str(e)}")
-                time.sleep(2)
+                completion_logger.warning(f"Error waiting for response: {str(e)}")
+                time.sleep(poll_interval)
                 continue
         
-        logging.warning("Response timeout reached, but may still have partial response")
+        completion_logger.warning("Response timeout reached, but may still have partial response")
         return False
     
+    @traced('extract_response')
     def extract_response(self):
         """Extract the response text from the latest AI message"""
+        try:
+            # One round trip: the page builds the whole payload in JavaScript
+            payload = self.driver.execute_script(EXTRACT_RESPONSE_JS)
+        except Exception as e:
+            logger.warning(f"Scripted extraction failed, falling back to per-element extraction: {str(e)}")
+            return self.extract_response_per_element()
+        
+        try:
+            if not payload:
+                logger.warning("No AI messages found")
+                return None
+            
+            response_text = "\n".join(
+                text.strip() for text in payload['paragraphs'] if text and text.strip()
+            )
+            
+            if not response_text:
+                # Fallback: use all text from the message element
+                response_text = (payload['text'] or "").strip()
+            
+            # Extract any citations/links
+            citations = [
+                link['href'] for link in payload['links']
+                if link['href'] and 'http' in link['href']
+            ]
+            
+            if not response_text:
+                logger.warning("No response text extracted")
+                return None
+            
+            return {
+                'text': response_text,
+                'citations': citations,
+                'html': payload['html'] or "",
+                'timestamp': datetime.now().isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error extracting response: {str(e)}")
+            return None
+    
+    def extract_response_per_element(self):
+        """Extract the latest AI message element by element (one WebDriver call per tag)"""
         try:
             # Find all AI message elements
             ai_messages = self.driver.find_elements(By.CSS_SELECTOR, ".group\\/ai-message-item")
             
             if not ai_messages:
-                logging.warning("No AI messages found")
+                logger.warning("No AI messages found")
                 return None
                 
             # Get the latest AI message
@@ -644,7 +1200,7 @@ class BingChatScraper:
                 pass
             
             if not response_text:
-                logging.warning("No response text extracted")
+                logger.warning("No response text extracted")
                 return None
             
             return {
@@ -655,7 +1211,7 @@ class BingChatScraper:
             }
             
         except Exception as e:
-            logging.error(f"Error extracting response: {str(e)}")
+            logger.error(f"Error extracting response: {str(e)}")
             return None
     
     def close(self):
@@ -664,325 +1220,173 @@ class BingChatScraper:
             self.driver.quit()
 
 
-class DataProcessor:
-    """Class for processing and storing scraped data"""
-    
-    def __init__(self, db_path='bing_chat_data.db'):
-        self.db_path = db_path
-        self.init_database()
-    
-    def init_database(self):
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create table for chat interactions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query TEXT NOT NULL,
-                response_text TEXT,
-                citations TEXT,
-                response_html TEXT,
-                timestamp DATETIME,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create table for analysis results
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analysis_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                analysis_type TEXT,
-                result TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create table for tracking verification events
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS verification_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_type TEXT,
-                timestamp DATETIME,
-                details TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def store_interaction(self, query, response):
-        """Store a query-response interaction in the database"""
-        if not response:
-            return False
-            
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO interactions (query, response_text, citations, response_html, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                query, 
-                response['text'], 
-                json.dumps(response['citations']), 
-                response['html'],
-                response['timestamp']
-            ))
-            
-            conn.commit()
-            conn.close()
-            return True
-            
-        except Exception as e:
-            logging.error(f"Error storing interaction: {str(e)}")
-            return False
-    
-    def record_verification_event(self, event_type, details=None):
-        """Record a verification event"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO verification_events (event_type, timestamp, details)
-                VALUES (?, ?, ?)
-            ''', (event_type, datetime.now().isoformat(), details))
-            
-            conn.commit()
-            conn.close()
-            return True
-            
-        except Exception as e:
-            logging.error(f"Error recording verification event: {str(e)}")
-            return False
-    
-    def load_interactions(self, limit=100):
-        """Load interactions from the database"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, query, response_text, citations, timestamp 
-                FROM interactions 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
-            
-            rows = cursor.fetchall()
-            conn.close()
-            
-            interactions = []
-            for row in rows:
-                interactions.append({
-                    'id': row[0],
-                    'query': row[1],
-                    'response_text': row[2],
-                    'citations': json.loads(row[3]) if row[3] else [],
-                    'timestamp': row[4]
-                })
-                
-            return interactions
-            
-        except Exception as e:
-            logging.error(f"Error loading interactions: {str(e)}")
-            return []
-    
-    def analyze_response_length(self):
-        """Analyze response length statistics"""
-        interactions = self.load_interactions(limit=1000)
-        
-        if not interactions:
-            return None
-            
-        response_lengths = [len(interaction['response_text']) for interaction in interactions]
-        
-        analysis = {
-            'total_interactions': len(interactions),
-            'avg_response_length': sum(response_lengths) / len(response_lengths),
-            'min_response_length': min(response_lengths),
-            'max_response_length': max(response_lengths),
-            'response_lengths': response_lengths
-        }
-        
-        # Store analysis result
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO analysis_results (analysis_type, result)
-                VALUES (?, ?)
-            ''', ('response_length', json.dumps(analysis)))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logging.error(f"Error storing analysis: {str(e)}")
-            
-        return analysis
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape Bing Chat answers for the queries in the job queue. Interrupted runs "
+                    "resume where they stopped: run again without --queries-file to finish the queue."
+    )
+    parser.add_argument('--queries-file', help="text file with one query per line to add to the queue "
+                                               "(queries already queued are skipped)")
+    parser.add_argument('--max-attempts', type=int, default=3, help="tries per query before it is marked failed")
+    parser.add_argument('--lease-seconds', type=float, default=JOB_LEASE_SECONDS,
+                        help="how long a claimed job is reserved before another run may take it over")
+    parser.add_argument('--log-json', metavar='PATH',
+                        help="also log as JSON Lines to PATH (rotated files are gzip-compressed)")
+    parser.add_argument('--verbose', '-v', action='store_true', help="log debug messages too")
+    args = parser.parse_args()
     
-    def analyze_citation_patterns(self):
-        """Analyze citation patterns in responses"""
-        interactions = self.load_interactions(limit=1000)
-        
-        if not interactions:
-            return None
-            
-        citation_counts = [len(interaction['citations']) for interaction in interactions]
-        has_citations = sum(1 for count in citation_counts if count > 0)
-        
-        analysis = {
-            'total_interactions': len(interactions),
-            'interactions_with_citations': has_citations,
-            'percent_with_citations': (has_citations / len(interactions)) * 100 if interactions else 0,
-            'avg_citations': sum(citation_counts) / len(citation_counts) if interactions else 0,
-            'max_citations': max(citation_counts) if interactions else 0,
-            'citation_counts': citation_counts
-        }
-        
-        # Store analysis result
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO analysis_results (analysis_type, result)
-                VALUES (?, ?)
-            ''', ('citation_patterns', json.dumps(analysis)))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logging.error(f"Error storing analysis: {str(e)}")
-            
-        return analysis
+    setup_logging(level=logging.DEBUG if args.verbose else logging.INFO, json_file=args.log_json)
     
-    def export_to_csv(self, filename='bing_chat_data.csv'):
-        """Export interactions to CSV file"""
-        interactions = self.load_interactions()
-        
-        if not interactions:
-            return False
-            
-        df = pd.DataFrame(interactions)
-        df.to_csv(filename, index=False)
-        return True
-
-
-def main():
     # Configuration
 
     USERNAME = os.getenv("BING_USERNAME") 
     PASSWORD = os.getenv("BING_PASSWORD")             
-    QUERIES = [
-        "Hello!", #first query to start verification checkbox (will produce no response)
-        "What is the capital of France?",
-        "Explain the theory of relativity in simple terms",
-        "What are the benefits of renewable energy?",
-    ]
+    # The first prompt of a session only brings up the verification checkbox (no response),
+    # so it is sent outside the job queue rather than being retried as a failed job
+    WARMUP_QUERY = "Hello!"
     
     # Initialize scraper and data processor
-    scraper = BingChatScraper(USERNAME, PASSWORD, headless=False)
     processor = DataProcessor()
+    if args.queries_file:
+        processor.enqueue_jobs(args.queries_file, max_attempts=args.max_attempts)
+    # Jobs left running by a crashed earlier run are picked up again right away
+    processor.reclaim_dead_leases()
+    logger.info(f"Job queue: {processor.job_counts()}")
+    if not processor.claimable_job_count():
+        # Jobs still leased to a live run elsewhere are left to it
+        logger.info("No queries to process; add some with --queries-file")
+        processor.close()
+        return
+    
+    scraper = BingChatScraper(USERNAME, PASSWORD, headless=False, data_processor=processor,
+                              query_cache=QueryCache(processor))
+    owner = job_owner()
     
     try:
         # Login to Bing Chat
-        if not scraper.login():
-            logging.error("Failed to login. Exiting.")
+        logged_in = scraper.login()
+        processor.store_timings(scraper.tracer.drain())
+        if not logged_in:
+            logger.error("Failed to login. Exiting.")
             return
         
-        logging.info("Login successful, starting query processing...")
+        logger.info("Login successful, starting query processing...")
         
         # Wait extra time after login to handle any verification or page loading
-        logging.info("Waiting 3 seconds for page to fully load and handle any verification...")
+        logger.info("Waiting 3 seconds for page to fully load and handle any verification...")
         time.sleep(3)
         
+        scraper.send_query(WARMUP_QUERY, bypass_cache=True)
+        processor.store_timings(scraper.tracer.drain())
+        
         # Check for and handle any remaining verification
         if scraper.check_for_human_verification():
-            logging.info("Handling post-login verification...")
+            logger.info("Handling post-login verification...")
             scraper.handle_human_verification()
             time.sleep(120)  # Additional wait after verification
         
-        # Send queries with random delays to avoid detection
+        # Work through the queue with random delays to avoid detection; each claim is
+        # atomic, so a crashed run leaves at most one job to be retried
         successful_queries = 0
-        for i, query in enumerate(QUERIES):
-            logging.info(f"Processing query {i+1}/{len(QUERIES)}: {query}")
+        processed_jobs = 0
+        browser_queries = 0
+        while True:
+            job = processor.claim_job(owner, lease_seconds=args.lease_seconds)
+            if job is None:
+                break
+            job_id = job['id']
+            query = job['query']
+            processed_jobs += 1
+            logger.info(f"Processing job {job_id} (attempt {job['attempts']}/{job['max_attempts']}): {query}")
             
             try:
-                # Random delay between requests (between 15 and 35 seconds)
-                if i > 0:  # Skip delay for first query after login wait
+                # Repeated prompts are answered from the cache without touching the browser;
+                # the answer was stored when it was first scraped
+                if scraper.query_cache.get(query) is not None:
+                    processor.complete_job(job_id, owner)
+                    successful_queries += 1
+                    logger.info(f"[SUCCESS] Job {job_id} answered from cache")
+                    continue
+                
+                # Random delay between browser requests (between 15 and 35 seconds)
+                if browser_queries > 0:  # Skip delay for first query after login wait
                     delay = random.uniform(15, 35)
-                    logging.info(f"Waiting for {delay:.2f} seconds before sending query...")
+                    logger.info(f"Waiting for {delay:.2f} seconds before sending query...")
                     time.sleep(delay)
                 
-                # Send query and get response
-                response = scraper.send_query(query)
+                # Send query and get response (the cache was checked above)
+                browser_queries += 1
+                response = scraper.send_query(query, bypass_cache=True)
+                timings = scraper.tracer.drain()
                 
                 if response and response.get('text'):
-                    # Store the interaction
-                    if processor.store_interaction(query, response):
+                    # Store the interaction and finish the job in one transaction
+                    if processor.complete_job(job_id, owner, query, response, timings):
                         successful_queries += 1
-                        logging.info(f"[SUCCESS] Query {i+1} successful - Response length: {len(response['text'])} characters")
+                        logger.info(f"[SUCCESS] Job {job_id} successful - Response length: {len(response['text'])} characters")
                         
                         # Print first 200 characters of response for verification
                         preview = response['text'][:200] + "..." if len(response['text']) > 200 else response['text']
-                        logging.info(f"Response preview: {preview}")
+                        logger.debug(f"Response preview: {preview}")
                     else:
-                        logging.error(f"[ERROR] Failed to store interaction for query {i+1}")
+                        logger.error(f"[ERROR] Failed to store interaction for job {job_id}")
                 else:
-                    logging.warning(f"[WARNING] No response received for query {i+1}: {query}")
+                    logger.warning(f"[WARNING] No response received for job {job_id}: {query}")
+                    processor.store_timings(timings)
+                    processor.fail_job(job_id, "no response", owner)
                 
                 # Additional random delay after processing
                 time.sleep(random.uniform(3, 8))
                 
             except Exception as e:
-                logging.error(f"[ERROR] Error processing query {i+1}: {str(e)}")
+                logger.error(f"[ERROR] Error processing job {job_id}: {str(e)}")
+                processor.fail_job(job_id, e, owner)
                 # Take screenshot for debugging
-                scraper.driver.save_screenshot(f"query_{i+1}_error_{int(time.time())}.png")
+                scraper.driver.save_screenshot(f"job_{job_id}_error_{int(time.time())}.png")
                 continue
         
-        logging.info(f"Query processing completed. Successful queries: {successful_queries}/{len(QUERIES)}")
+        logger.info(f"Query processing completed. Successful queries: {successful_queries}/{processed_jobs}")
+        logger.info(f"Job queue: {processor.job_counts()}")
+        logger.info(f"Query cache: {scraper.query_cache.stats()}")
         
         if successful_queries > 0:
             # Perform data analysis
-            logging.info("Performing data analysis...")
+            logger.info("Performing data analysis...")
             
             # Analyze response lengths
             length_analysis = processor.analyze_response_length()
             if length_analysis:
-                logging.info(f"[ANALYSIS] Response length analysis:")
-                logging.info(f"  - Total interactions: {length_analysis['total_interactions']}")
-                logging.info(f"  - Average response length: {length_analysis['avg_response_length']:.1f} characters")
-                logging.info(f"  - Min length: {length_analysis['min_response_length']}")
-                logging.info(f"  - Max length: {length_analysis['max_response_length']}")
+                logger.info(f"[ANALYSIS] Response length analysis:")
+                logger.info(f"  - Total interactions: {length_analysis['total_interactions']}")
+                logger.info(f"  - Average response length: {length_analysis['avg_response_length']:.1f} characters")
+                logger.info(f"  - Min length: {length_analysis['min_response_length']}")
+                logger.info(f"  - Max length: {length_analysis['max_response_length']}")
             
             # Analyze citation patterns
             citation_analysis = processor.analyze_citation_patterns()
             if citation_analysis:
-                logging.info(f"[ANALYSIS] Citation analysis:")
-                logging.info(f"  - Interactions with citations: {citation_analysis['interactions_with_citations']}")
-                logging.info(f"  - Percentage with citations: {citation_analysis['percent_with_citations']:.1f}%")
-                logging.info(f"  - Average citations per response: {citation_analysis['avg_citations']:.1f}")
+                logger.info(f"[ANALYSIS] Citation analysis:")
+                logger.info(f"  - Interactions with citations: {citation_analysis['interactions_with_citations']}")
+                logger.info(f"  - Percentage with citations: {citation_analysis['percent_with_citations']:.1f}%")
+                logger.info(f"  - Average citations per response: {citation_analysis['avg_citations']:.1f}")
+            
+            # Report where the time went, slowest phase first
+            logger.info("[ANALYSIS] Phase latency (p50 / p95):")
+            for phase in processor.timing_summary():
+                logger.info(f"  - {phase['phase']}: {phase['p50_ms']:.0f} / {phase['p95_ms']:.0f} ms over {phase['count']} runs")
             
             # Export data to CSV
             if processor.export_to_csv():
-                logging.info("[SUCCESS] Data exported to CSV successfully")
+                logger.info("[SUCCESS] Data exported to CSV successfully")
             
-            logging.info("[COMPLETE] Scraping and analysis completed successfully!")
+            logger.info("[COMPLETE] Scraping and analysis completed successfully!")
         else:
-            logging.error("[ERROR] No successful queries processed")
+            logger.error("[ERROR] No successful queries processed")
         
     except KeyboardInterrupt:
-        logging.info("Script interrupted by user")
+        logger.info("Script interrupted by user")
     except Exception as e:
-        logging.error(f"An unexpected error occurred during scraping: {str(e)}")
+        logger.error(f"An unexpected error occurred during scraping: {str(e)}")
         # Take screenshot for debugging
         try:
             scraper.driver.save_screenshot(f"main_error_{int(time.time())}.png")
@@ -993,9 +1397,17 @@ def main():
         # Close the browser
         try:
             scraper.close()
-            logging.info("Browser closed")
+            logger.info("Browser closed")
         except:
             pass
+        
+        # Hand back a job interrupted mid-query (Ctrl+C) so the next run starts with it
+        released = processor.release_jobs(owner)
+        if released:
+            logger.info(f"Returned {released} unfinished job(s) to the queue")
+        
+        # Flush queued writes and close the database
+        processor.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,1980 @@
+"""SQLite storage, analysis and export of scraped interactions (no browser dependencies)"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from exporters import EXPORTERS, exporter_format
+from html_codec import compress_html, decompress_html, html_hash
+from query_cache import query_hash
+
+
+logger = logging.getLogger('data_processor')
+
+
+# Columns of the interactions table that can be exported
+EXPORT_COLUMNS = ('id', 'query', 'response_text', 'citations', 'code_blocks', 'tables', 'response_html',
+                  'timestamp', 'created_at')
+DEFAULT_EXPORT_COLUMNS = ('id', 'query', 'response_text', 'citations', 'timestamp')
+
+# Query-length bucket upper bounds (characters) for learned completion windows
+QUERY_LENGTH_BUCKETS = (40, 120, 400)
+
+# Cached analysis_results rows kept per analysis type
+ANALYSIS_CACHE_KEEP = 3
+
+# Seconds a claimed job stays leased to its worker before others may take it over
+JOB_LEASE_SECONDS = 600
+
+
+def query_length_bucket(query_length):
+    """Index of the QUERY_LENGTH_BUCKETS bucket a query length falls into"""
+    for bucket, upper_bound in enumerate(QUERY_LENGTH_BUCKETS):
+        if query_length < upper_bound:
+            return bucket
+    return len(QUERY_LENGTH_BUCKETS)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def url_domain(url):
+    """Host part of a URL, lowercased and without a leading 'www.'"""
+    try:
+        host = (urlparse(url).hostname or '').lower()
+    except (ValueError, TypeError):
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def job_owner():
+    """Lease owner name of this process: host and pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def process_alive(pid):
+    """Whether a process with this pid is running on this machine"""
+    if sys.platform.startswith('win'):
+        # os.kill would terminate the process on Windows: ask for its exit code instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        try:
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        finally:
+            kernel32.CloseHandle(handle)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+class DataProcessor:
+    """Class for processing and storing scraped data"""
+    
+    def __init__(self, db_path='bing_chat_data.db', write_behind=True, batch_size=100,
+                 flush_interval_ms=500, synchronous='NORMAL', cache_size_kb=16384):
+        """
+        Open a long-lived connection to the SQLite database.
+
+        The connection runs in WAL mode so readers never block the writer. With
+        write_behind enabled, inserts are queued and committed by a background
+        thread in one transaction per batch_size rows or flush_interval_ms,
+        whichever comes first. Call flush() to wait for pending writes and
+        close() to flush and release the connection.
+        """
+        self.db_path = db_path
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.lock = threading.RLock()
+        self.conn = self.connect()
+        self.write_queue = queue.Queue()
+        self.writer_thread = None
+        self.closed = False
+        self.init_database()
+        if self.write_behind:
+            self.start_writer()
+        atexit.register(self.close)
+    
+    def connect(self):
+        """Open the shared connection and apply performance pragmas"""
+        # isolation_level=None leaves transaction control to transaction()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.create_function("url_domain", 1, url_domain, deterministic=True)
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in a single write transaction"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+    
+    def init_database(self):
+        """Initialize SQLite database"""
+        with self.transaction() as cursor:
+            # Create table for chat interactions
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS interactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    query TEXT NOT NULL,
+                    response_text TEXT,
+                    citations TEXT,
+                    response_html TEXT,
+                    timestamp DATETIME,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create table for analysis results
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    analysis_type TEXT,
+                    result TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create table for tracking verification events
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS verification_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_type TEXT,
+                    timestamp DATETIME,
+                    details TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+        self.migrate()
+    
+    def migrations(self):
+        """Ordered (schema_version, step) pairs applied on top of the base tables"""
+        return [
+            (1, self.migrate_add_indexes),
+            (2, self.migrate_add_export_watermarks),
+            (3, self.migrate_add_interaction_stats),
+            (4, self.migrate_add_analysis_cache),
+            (5, self.migrate_add_html_blobs),
+            (6, self.migrate_add_search_index),
+            (7, self.migrate_add_citations),
+            (8, self.migrate_add_response_timings),
+            (9, self.migrate_add_timings),
+            (10, self.migrate_add_query_cache),
+            (11, self.migrate_add_extracted_structure),
+            (12, self.migrate_add_jobs),
+            (13, self.migrate_query_cache_html_blobs),
+        ]
+    
+    def migrate(self):
+        """Bring the database up to the latest schema version, one step per transaction"""
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        
+        for target_version, step in self.migrations():
+            if version >= target_version:
+                continue
+            logger.info(f"Migrating {self.db_path} to schema version {target_version}")
+            with self.transaction() as cursor:
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version={target_version}")
+            version = target_version
+    
+    def migrate_add_indexes(self, cursor):
+        """Index the columns used for ordering and keyset pagination"""
+        # (timestamp, id) serves ORDER BY timestamp DESC and the keyset cursor in iter_interactions
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_interactions_timestamp
+            ON interactions (timestamp, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_analysis_results_type
+            ON analysis_results (analysis_type, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_verification_events_timestamp
+            ON verification_events (timestamp)
+        ''')
+    
+    def migrate_add_export_watermarks(self, cursor):
+        """Track the last exported interaction id and file offset per export destination"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS export_watermarks (
+                destination TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                file_offset INTEGER NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    def migrate_add_interaction_stats(self, cursor):
+        """Create the running-aggregate table and seed it from existing rows"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS interaction_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                interaction_count INTEGER NOT NULL DEFAULT 0,
+                length_sum INTEGER NOT NULL DEFAULT 0,
+                length_sum_sq INTEGER NOT NULL DEFAULT 0,
+                length_min INTEGER,
+                length_max INTEGER,
+                citation_sum INTEGER NOT NULL DEFAULT 0,
+                citation_max INTEGER,
+                with_citations INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.compute_aggregates(cursor)
+    
+    def migrate_add_analysis_cache(self, cursor):
+        """Key analysis results by the highest interaction id they cover"""
+        cursor.execute("ALTER TABLE analysis_results ADD COLUMN covered_max_id INTEGER")
+        cursor.execute("ALTER TABLE analysis_results ADD COLUMN state TEXT")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_analysis_results_watermark
+            ON analysis_results (analysis_type, covered_max_id)
+        ''')
+    
+    def migrate_add_html_blobs(self, cursor):
+        """Store response HTML compressed and deduplicated by content hash"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS html_blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                data BLOB NOT NULL,
+                raw_size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        # Legacy rows keep their inline response_html until compact_html() moves them
+        cursor.execute("ALTER TABLE interactions ADD COLUMN html_hash TEXT")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_interactions_html_hash
+            ON interactions (html_hash)
+        ''')
+    
+    def migrate_add_search_index(self, cursor):
+        """Create and populate the FTS5 index, if this SQLite build has FTS5"""
+        try:
+            self.create_search_index(cursor)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Full-text search unavailable, skipping index: {str(e)}")
+            return
+        cursor.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('rebuild')")
+    
+    def create_search_index(self, cursor):
+        """Create the external-content FTS5 table and the triggers that keep it in sync"""
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+                query, response_text,
+                content='interactions', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_insert AFTER INSERT ON interactions BEGIN
+                INSERT INTO interactions_fts (rowid, query, response_text)
+                VALUES (new.id, new.query, new.response_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_delete AFTER DELETE ON interactions BEGIN
+                INSERT INTO interactions_fts (interactions_fts, rowid, query, response_text)
+                VALUES ('delete', old.id, old.query, old.response_text);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS interactions_fts_update
+            AFTER UPDATE OF query, response_text ON interactions BEGIN
+                INSERT INTO interactions_fts (interactions_fts, rowid, query, response_text)
+                VALUES ('delete', old.id, old.query, old.response_text);
+                INSERT INTO interactions_fts (rowid, query, response_text)
+                VALUES (new.id, new.query, new.response_text);
+            END
+        ''')
+    
+    def migrate_add_citations(self, cursor):
+        """Normalize citations into their own table and backfill it from the JSON column"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS citations (
+                id INTEGER PRIMARY KEY,
+                interaction_id INTEGER NOT NULL REFERENCES interactions (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                domain TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_citations_domain
+            ON citations (domain, interaction_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_citations_interaction
+            ON citations (interaction_id)
+        ''')
+        self.backfill_citations(cursor)
+    
+    def backfill_citations(self, cursor, after_id=0):
+        """Populate citations from interactions.citations JSON for rows with id > after_id"""
+        cursor.execute('''
+            INSERT INTO citations (interaction_id, position, url, domain)
+            SELECT i.id, j.key, j.value, url_domain(j.value)
+            FROM interactions i, json_each(i.citations) j
+            WHERE i.id > ? AND json_valid(i.citations) AND j.type = 'text'
+            ORDER BY i.id, j.key
+        ''', (after_id,))
+    
+    def migrate_add_response_timings(self, cursor):
+        """Record how answers streamed in, for learned completion windows"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS response_timings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query_length INTEGER NOT NULL,
+                length_bucket INTEGER NOT NULL,
+                mode TEXT,
+                completed INTEGER NOT NULL,
+                first_token_seconds REAL,
+                total_seconds REAL NOT NULL,
+                update_count INTEGER NOT NULL,
+                mean_gap_seconds REAL,
+                max_gap_seconds REAL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_response_timings_bucket
+            ON response_timings (length_bucket, id)
+        ''')
+    
+    def migrate_add_timings(self, cursor):
+        """Per-phase timing spans of scraper calls, linked to the interaction they produced"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS timings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                interaction_id INTEGER REFERENCES interactions (id) ON DELETE SET NULL,
+                trace_id TEXT NOT NULL,
+                span_id INTEGER NOT NULL,
+                parent_span_id INTEGER,
+                name TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                duration_ms REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_timings_name
+            ON timings (name, trace_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_timings_interaction
+            ON timings (interaction_id)
+        ''')
+    
+    def migrate_add_query_cache(self, cursor):
+        """Cached answers keyed by normalized query hash, for QueryCache"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS query_cache (
+                query_hash TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_query_cache_stored_at
+            ON query_cache (stored_at)
+        ''')
+    
+    def migrate_add_extracted_structure(self, cursor):
+        """Columns filled by reextract(): code blocks, tables and the extractor version used"""
+        cursor.execute("ALTER TABLE interactions ADD COLUMN code_blocks TEXT")
+        cursor.execute("ALTER TABLE interactions ADD COLUMN tables TEXT")
+        cursor.execute("ALTER TABLE interactions ADD COLUMN extractor_version INTEGER")
+    
+    def migrate_add_jobs(self, cursor):
+        """Persistent query queue: one row per query to scrape, leased to the worker running it"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending'
+                    CHECK (state IN ('pending', 'running', 'done', 'failed')),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                interaction_id INTEGER REFERENCES interactions(id),
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_state
+            ON jobs (state, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_query_hash
+            ON jobs (query_hash)
+        ''')
+    
+    def migrate_query_cache_html_blobs(self, cursor):
+        """Move the HTML inside cached responses into html_blobs, referenced by hash"""
+        cursor.execute("ALTER TABLE query_cache ADD COLUMN html_hash TEXT")
+        rows = cursor.execute("SELECT query_hash, response FROM query_cache").fetchall()
+        for key, response_json in rows:
+            response = json.loads(response_json)
+            digest = self.store_html(cursor, response.pop('html', None))
+            cursor.execute(
+                "UPDATE query_cache SET response = ?, html_hash = ? WHERE query_hash = ?",
+                (json.dumps(response), digest, key)
+            )
+    
+    def start_writer(self):
+        """Start the background thread that commits queued writes in batches"""
+        self.writer_thread = threading.Thread(
+            target=self.writer_loop, name="DataProcessorWriter", daemon=True
+        )
+        self.writer_thread.start()
+    
+    def writer_loop(self):
+        """Drain the write queue, committing one transaction per batch"""
+        flush_interval = self.flush_interval_ms / 1000.0
+        running = True
+        
+        while running:
+            item = self.write_queue.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + flush_interval
+            
+            while True:
+                if item is None:
+                    # Shutdown sentinel: write what we have and stop
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    # flush() marker: write immediately and wake the caller
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.write_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self.write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+    
+    def write_batch(self, batch):
+        """Apply a batch of queued writes in a single transaction"""
+        try:
+            with self.transaction() as cursor:
+                for operation, args in batch:
+                    operation(cursor, *args)
+            logger.debug(f"Committed {len(batch)} queued writes")
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(batch)}, retrying individually: {str(e)}")
+            # Isolate the failing write so the rest of the batch is not lost
+            for operation, args in batch:
+                try:
+                    with self.transaction() as cursor:
+                        operation(cursor, *args)
+                except Exception as e:
+                    logger.error(f"Error applying queued write: {str(e)}")
+    
+    def submit(self, operation, *args):
+        """Queue a write for the background writer, or apply it now if write-behind is off"""
+        if self.writer_thread is not None:
+            self.write_queue.put((operation, args))
+        else:
+            with self.transaction() as cursor:
+                operation(cursor, *args)
+    
+    def flush(self):
+        """Block until every queued write has been committed"""
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            return
+        done = threading.Event()
+        self.write_queue.put(done)
+        done.wait()
+    
+    def close(self):
+        """Flush pending writes, stop the writer thread and close the connection"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer_thread is not None:
+            self.write_queue.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+        with self.lock:
+            self.conn.close()
+        atexit.unregister(self.close)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def insert_interactions(self, cursor, rows):
+        """
+        Insert interaction rows with executemany (runs inside a write
+        transaction) and return their new ids in order.
+        """
+        stored_rows = [
+            (query, text, citations, self.store_html(cursor, html), timestamp)
+            for query, text, citations, html, timestamp in rows
+        ]
+        previous_max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM interactions").fetchone()[0]
+        cursor.executemany('''
+            INSERT INTO interactions (query, response_text, citations, html_hash, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', stored_rows)
+        # We hold the write lock, so the new rows are exactly those past the old maximum
+        interaction_ids = [
+            row[0] for row in cursor.execute(
+                "SELECT id FROM interactions WHERE id > ? ORDER BY id", (previous_max_id,)
+            )
+        ]
+        
+        self.insert_citations(cursor, [
+            (interaction_id, position, url, url_domain(url))
+            for interaction_id, row in zip(interaction_ids, rows)
+            for position, url in enumerate(json.loads(row[2]) if row[2] else [])
+        ])
+        self.update_aggregates(cursor, rows)
+        return interaction_ids
+    
+    def insert_citations(self, cursor, citation_rows):
+        """Insert (interaction_id, position, url, domain) rows into the citations table"""
+        cursor.executemany('''
+            INSERT INTO citations (interaction_id, position, url, domain)
+            VALUES (?, ?, ?, ?)
+        ''', citation_rows)
+    
+    def store_html(self, cursor, html):
+        """Store HTML in html_blobs unless identical markup is already there; returns its hash"""
+        if not html:
+            return None
+        digest = html_hash(html)
+        if not self.html_blob_exists(cursor, digest):
+            self.insert_html_blob(cursor, digest, html)
+        return digest
+    
+    def html_blob_exists(self, cursor, digest):
+        return cursor.execute("SELECT 1 FROM html_blobs WHERE hash = ?", (digest,)).fetchone() is not None
+    
+    def insert_html_blob(self, cursor, digest, html):
+        """Compress and insert one blob; returns its stored size in bytes"""
+        codec, data = compress_html(html)
+        cursor.execute('''
+            INSERT INTO html_blobs (hash, codec, data, raw_size, stored_size)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (digest, codec, data, len(html.encode('utf-8')), len(data)))
+        return len(data)
+    
+    def get_response_html(self, interaction_id):
+        """Return the stored HTML of an interaction, decompressing it on demand"""
+        self.flush()
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT i.response_html, b.codec, b.data
+                FROM interactions i LEFT JOIN html_blobs b ON b.hash = i.html_hash
+                WHERE i.id = ?
+            ''', (interaction_id,)).fetchone()
+        if row is None:
+            return None
+        inline_html, codec, data = row
+        return decompress_html(codec, data) if data is not None else inline_html
+    
+    def update_aggregates(self, cursor, rows):
+        """Fold a batch of new interaction rows into the running aggregates"""
+        if not rows:
+            return
+        lengths = [len(row[1] or '') for row in rows]
+        citation_counts = [len(json.loads(row[2])) if row[2] else 0 for row in rows]
+        
+        cursor.execute('''
+            UPDATE interaction_stats SET
+                interaction_count = interaction_count + ?,
+                length_sum = length_sum + ?,
+                length_sum_sq = length_sum_sq + ?,
+                length_min = CASE WHEN length_min IS NULL OR length_min > ? THEN ? ELSE length_min END,
+                length_max = CASE WHEN length_max IS NULL OR length_max < ? THEN ? ELSE length_max END,
+                citation_sum = citation_sum + ?,
+                citation_max = CASE WHEN citation_max IS NULL OR citation_max < ? THEN ? ELSE citation_max END,
+                with_citations = with_citations + ?
+            WHERE id = 1
+        ''', (
+            len(rows),
+            sum(lengths),
+            sum(length * length for length in lengths),
+            min(lengths), min(lengths),
+            max(lengths), max(lengths),
+            sum(citation_counts),
+            max(citation_counts), max(citation_counts),
+            sum(1 for count in citation_counts if count > 0)
+        ))
+    
+    def compute_aggregates(self, cursor):
+        """Recompute the running aggregates from the full interactions table in one pass"""
+        cursor.execute("DELETE FROM interaction_stats")
+        cursor.execute('''
+            INSERT INTO interaction_stats (
+                id, interaction_count, length_sum, length_sum_sq, length_min, length_max,
+                citation_sum, citation_max, with_citations
+            )
+            SELECT 1, COUNT(*), COALESCE(SUM(len), 0), COALESCE(SUM(len * len), 0), MIN(len), MAX(len),
+                   COALESCE(SUM(cites), 0), MAX(cites), COALESCE(SUM(cites > 0), 0)
+            FROM (
+                SELECT COALESCE(length(response_text), 0) AS len,
+                       CASE WHEN json_valid(citations) THEN json_array_length(citations) ELSE 0 END AS cites
+                FROM interactions
+            )
+        ''')
+    
+    def rebuild_aggregates(self):
+        """Recompute the running aggregates, e.g. after rows were edited or deleted by hand"""
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                self.compute_aggregates(cursor)
+            # Cached analyses were folded from the same rows and are stale too
+            self.clear_analysis_cache()
+            logger.info("Rebuilt interaction aggregates")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding aggregates: {str(e)}")
+            return False
+    
+    def get_running_stats(self):
+        """Return the running aggregates over the full interaction history"""
+        self.flush()
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM interaction_stats WHERE id = 1")
+            row = cursor.fetchone()
+            columns = [description[0] for description in cursor.description]
+        return dict(zip(columns, row)) if row else None
+    
+    def insert_verification_event(self, cursor, row):
+        """Insert a single verification event (runs inside a write transaction)"""
+        cursor.execute('''
+            INSERT INTO verification_events (event_type, timestamp, details)
+            VALUES (?, ?, ?)
+        ''', row)
+    
+    def insert_analysis_result(self, cursor, analysis_type, result, covered_max_id=None, state=None, keep=None):
+        """
+        Insert an analysis result (runs inside a write transaction). With keep
+        set, older rows of the same type beyond the newest keep are evicted.
+        """
+        cursor.execute('''
+            INSERT INTO analysis_results (analysis_type, result, covered_max_id, state)
+            VALUES (?, ?, ?, ?)
+        ''', (analysis_type, result, covered_max_id, state))
+        if keep:
+            cursor.execute('''
+                DELETE FROM analysis_results
+                WHERE analysis_type = ? AND id NOT IN (
+                    SELECT id FROM analysis_results
+                    WHERE analysis_type = ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                )
+            ''', (analysis_type, analysis_type, keep))
+    
+    def store_interaction(self, query, response, timings=None):
+        """
+        Store a query-response interaction in the database, along with the
+        timing spans (SpanTracer.drain()) recorded while producing it.
+        Returns False without storing anything if the response has no text.
+        """
+        try:
+            response = self.valid_response(query, response)
+        except ValueError as e:
+            logger.warning(f"Not storing interaction: {str(e)}")
+            return False
+            
+        try:
+            self.submit(self.insert_interaction_with_timings, self.interaction_row(query, response), timings)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error storing interaction: {str(e)}")
+            return False
+    
+    def insert_interaction_with_timings(self, cursor, row, timings):
+        """Insert one interaction and link its timing spans to it (runs inside a write transaction)"""
+        interaction_id = self.insert_interactions(cursor, [row])[0]
+        if timings:
+            self.insert_timings(cursor, timings, interaction_id)
+        return interaction_id
+    
+    def insert_timings(self, cursor, spans, interaction_id=None):
+        """Insert timing spans (runs inside a write transaction)"""
+        cursor.executemany('''
+            INSERT INTO timings (
+                interaction_id, trace_id, span_id, parent_span_id, name, depth, started_at, duration_ms
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                interaction_id, span['trace_id'], span['span_id'], span['parent_span_id'],
+                span['name'], span['depth'], span['started_at'], span['duration_ms']
+            )
+            for span in spans
+        ])
+    
+    def store_timings(self, spans, interaction_id=None):
+        """Store timing spans that did not produce a stored interaction (e.g. login)"""
+        if not spans:
+            return True
+        try:
+            self.submit(self.insert_timings, spans, interaction_id)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error storing timings: {str(e)}")
+            return False
+    
+    def timing_summary(self, since=None):
+        """
+        p50/p95 latency per phase, slowest p95 first.
+
+        Repeated spans of the same phase within one trace (e.g. several
+        verification checks during one query) are summed first, so each
+        sample is the time one login or query spent in that phase. since
+        limits the report to spans started after a Unix timestamp.
+        """
+        try:
+            self.flush()
+            with self.lock:
+                rows = self.conn.execute('''
+                    SELECT name, SUM(duration_ms)
+                    FROM timings
+                    WHERE started_at >= ?
+                    GROUP BY name, trace_id
+                ''', (since or 0,)).fetchall()
+        except Exception as e:
+            logger.error(f"Error loading timings: {str(e)}")
+            return []
+        
+        samples = {}
+        for name, duration_ms in rows:
+            samples.setdefault(name, []).append(duration_ms)
+        
+        summary = []
+        for name, durations in samples.items():
+            durations.sort()
+            summary.append({
+                'phase': name,
+                'count': len(durations),
+                'mean_ms': sum(durations) / len(durations),
+                'p50_ms': percentile(durations, 0.5),
+                'p95_ms': percentile(durations, 0.95),
+            })
+        summary.sort(key=lambda phase: phase['p95_ms'], reverse=True)
+        return summary
+    
+    def valid_response(self, query, response):
+        """
+        Check a (query, response) record before it is stored: returns the
+        response as an extract_response-shaped dict (a plain string is taken
+        as the response text), or raises ValueError if query is not a string
+        or there is no non-empty response text.
+        """
+        if isinstance(response, str):
+            response = {'text': response}
+        if not isinstance(query, str):
+            raise ValueError("query is not a string")
+        if not isinstance(response, dict) or not isinstance(response.get('text'), str) or not response['text']:
+            raise ValueError("no response text")
+        return response
+    
+    def interaction_row(self, query, response):
+        """Build the interactions table row for a query and a dict checked by valid_response"""
+        return (
+            query, 
+            response['text'], 
+            json.dumps(response.get('citations') or []), 
+            response.get('html') or '',
+            response.get('timestamp') or datetime.now().isoformat()
+        )
+    
+    def store_interactions_many(self, interactions, chunk_size=1000):
+        """
+        Bulk-insert interactions, one transaction per chunk.
+
+        interactions is either an iterable of (query, response) pairs or the
+        path to a JSONL file (see read_interactions_jsonl). Rows are streamed,
+        so the input is never held in memory as a whole. Records that fail
+        valid_response (no response text) are logged and skipped; the rest
+        are still written.
+        Returns a report with the rows written by each chunk, the total and
+        the number of skipped records, or None if writing failed (chunks
+        committed before the error stay in the database).
+        """
+        skipped = []
+        if isinstance(interactions, (str, os.PathLike)):
+            interactions = self.read_interactions_jsonl(interactions, skipped)
+        
+        # Keep ordering with anything still sitting in the write-behind queue
+        self.flush()
+        
+        chunk_counts = []
+        chunk = []
+        try:
+            for position, (query, response) in enumerate(interactions, 1):
+                try:
+                    response = self.valid_response(query, response)
+                except ValueError as e:
+                    logger.warning(f"Skipping interaction {position}: {str(e)}")
+                    skipped.append(position)
+                    continue
+                chunk.append(self.interaction_row(query, response))
+                if len(chunk) >= chunk_size:
+                    chunk_counts.append(self.write_interaction_chunk(chunk))
+                    chunk = []
+            if chunk:
+                chunk_counts.append(self.write_interaction_chunk(chunk))
+                
+        except Exception as e:
+            logger.error(f"Error in bulk insert after {sum(chunk_counts)} rows: {str(e)}")
+            return None
+        
+        if skipped:
+            logger.warning(f"Skipped {len(skipped)} records (malformed or without response text)")
+        return {'chunks': chunk_counts, 'rows': sum(chunk_counts), 'skipped': len(skipped)}
+    
+    def write_interaction_chunk(self, rows):
+        """Write one chunk of interaction rows in a single transaction"""
+        with self.transaction() as cursor:
+            self.insert_interactions(cursor, rows)
+        logger.debug(f"Bulk inserted {len(rows)} interactions")
+        return len(rows)
+    
+    def read_interactions_jsonl(self, path, skipped=None):
+        """
+        Yield (query, response) pairs from a JSONL file.
+
+        Each line is a JSON object with a 'query' key and either a 'response'
+        object shaped like extract_response() output or those fields ('text',
+        'citations', 'html', 'timestamp') inline. A plain string response is
+        taken as the response text. Malformed lines, and lines without
+        response text, are logged and skipped; their line numbers are
+        appended to skipped if a list is given.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    query = record['query']
+                    response = self.valid_response(query, record.get('response', record))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    logger.warning(f"Skipping line {line_number} of {path}: {str(e)}")
+                    if skipped is not None:
+                        skipped.append(line_number)
+                    continue
+                yield query, response
+    
+    def record_verification_event(self, event_type, details=None):
+        """Record a verification event"""
+        try:
+            row = (event_type, datetime.now().isoformat(), details)
+            self.submit(self.insert_verification_event, row)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error recording verification event: {str(e)}")
+            return False
+    
+    def record_response_timing(self, query_length, first_token_seconds, total_seconds, gaps, mode, completed):
+        """Record how one answer streamed in (gaps are seconds between updates)"""
+        try:
+            row = (
+                query_length,
+                query_length_bucket(query_length),
+                mode,
+                int(bool(completed)),
+                first_token_seconds,
+                total_seconds,
+                len(gaps),
+                sum(gaps) / len(gaps) if gaps else None,
+                max(gaps) if gaps else None
+            )
+            self.submit(self.insert_response_timing, row)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error recording response timing: {str(e)}")
+            return False
+    
+    def insert_response_timing(self, cursor, row):
+        """Insert a single response timing (runs inside a write transaction)"""
+        cursor.execute('''
+            INSERT INTO response_timings (
+                query_length, length_bucket, mode, completed, first_token_seconds,
+                total_seconds, update_count, mean_gap_seconds, max_gap_seconds
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', row)
+    
+    def response_timing_stats(self, query_length, window=200):
+        """
+        Timing percentiles of the last window completed answers whose query
+        fell into the same length bucket, or None without history.
+        """
+        bucket = query_length_bucket(query_length)
+        try:
+            self.flush()
+            with self.lock:
+                rows = self.conn.execute('''
+                    SELECT first_token_seconds, total_seconds, COALESCE(max_gap_seconds, 0)
+                    FROM response_timings
+                    WHERE length_bucket = ? AND completed = 1
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (bucket, window)).fetchall()
+        except Exception as e:
+            logger.error(f"Error loading response timings: {str(e)}")
+            return None
+        
+        if not rows:
+            return None
+        first_tokens = sorted(row[0] for row in rows if row[0] is not None)
+        totals = sorted(row[1] for row in rows)
+        max_gaps = sorted(row[2] for row in rows)
+        return {
+            'bucket': bucket,
+            'samples': len(rows),
+            'first_token_p50': percentile(first_tokens, 0.5) if first_tokens else None,
+            'first_token_p95': percentile(first_tokens, 0.95) if first_tokens else None,
+            'total_p50': percentile(totals, 0.5),
+            'total_p95': percentile(totals, 0.95),
+            'max_gap_p50': percentile(max_gaps, 0.5),
+            'max_gap_p95': percentile(max_gaps, 0.95),
+        }
+    
+    def get_cached_response(self, query_hash, oldest=0):
+        """Return (stored_at, response) cached for query_hash if stored at or after oldest, else None"""
+        try:
+            self.flush()
+            with self.lock:
+                row = self.conn.execute('''
+                    SELECT q.stored_at, q.response, b.codec, b.data
+                    FROM query_cache q LEFT JOIN html_blobs b ON b.hash = q.html_hash
+                    WHERE q.query_hash = ? AND q.stored_at >= ?
+                ''', (query_hash, oldest)).fetchone()
+        except Exception as e:
+            logger.error(f"Error reading query cache: {str(e)}")
+            return None
+        
+        if row is None:
+            return None
+        stored_at, response_json, codec, data = row
+        response = json.loads(response_json)
+        if data is not None:
+            response['html'] = decompress_html(codec, data)
+        return stored_at, response
+    
+    def cache_response(self, query_hash, query, response, stored_at=None, expire_before=None):
+        """
+        Store (or refresh) the cached response for a query. Its HTML goes to
+        html_blobs (usually already there from the stored interaction) and is
+        referenced by hash. Entries stored before the Unix timestamp
+        expire_before are evicted in the same transaction.
+        """
+        try:
+            response = dict(response)
+            html = response.pop('html', None)
+            row = (query_hash, query, json.dumps(response), stored_at or time.time())
+            self.submit(self.insert_cached_response, row, html, expire_before)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error caching response: {str(e)}")
+            return False
+    
+    def insert_cached_response(self, cursor, row, html=None, expire_before=None):
+        """Upsert a single query cache entry, evicting expired ones (runs inside a write transaction)"""
+        cursor.execute('''
+            INSERT OR REPLACE INTO query_cache (query_hash, query, response, stored_at, html_hash)
+            VALUES (?, ?, ?, ?, ?)
+        ''', row + (self.store_html(cursor, html),))
+        if expire_before is not None:
+            cursor.execute("DELETE FROM query_cache WHERE stored_at < ?", (expire_before,))
+    
+    def clear_query_cache(self, query_hash=None, older_than=None):
+        """
+        Delete cached responses: the one for query_hash, those stored before
+        the Unix timestamp older_than, or (with neither) all of them.
+        """
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                if query_hash is not None:
+                    cursor.execute("DELETE FROM query_cache WHERE query_hash = ?", (query_hash,))
+                elif older_than is not None:
+                    cursor.execute("DELETE FROM query_cache WHERE stored_at < ?", (older_than,))
+                else:
+                    cursor.execute("DELETE FROM query_cache")
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error clearing query cache: {str(e)}")
+            return 0
+    
+    def enqueue_jobs(self, queries, max_attempts=3, skip_existing=True, chunk_size=1000):
+        """
+        Add queries to the job queue, one transaction per chunk.
+
+        queries is an iterable of strings or the path to a text file with
+        one query per line (see read_queries_file). With skip_existing, a
+        query that already has a job in any state (compared in the
+        normalized form used by the query cache) is not added again, so
+        enqueueing the same file on every run is safe. Returns the number of
+        jobs added.
+        """
+        if isinstance(queries, (str, os.PathLike)):
+            queries = self.read_queries_file(queries)
+        
+        added = 0
+        chunk = []
+        try:
+            for query in queries:
+                chunk.append(query)
+                if len(chunk) >= chunk_size:
+                    added += self.write_job_chunk(chunk, max_attempts, skip_existing)
+                    chunk = []
+            if chunk:
+                added += self.write_job_chunk(chunk, max_attempts, skip_existing)
+            logger.info(f"Enqueued {added} jobs")
+            
+        except Exception as e:
+            logger.error(f"Error enqueueing jobs after {added}: {str(e)}")
+            
+        return added
+    
+    def write_job_chunk(self, queries, max_attempts, skip_existing):
+        """Insert one chunk of jobs in a single transaction and return how many were added"""
+        now = time.time()
+        rows = [(query, query_hash(query), max_attempts, now, now) for query in queries]
+        with self.transaction() as cursor:
+            if skip_existing:
+                # Rows are inserted one by one, so duplicates within the chunk are skipped too
+                cursor.executemany('''
+                    INSERT INTO jobs (query, query_hash, max_attempts, created_at, updated_at)
+                    SELECT ?1, ?2, ?3, ?4, ?5
+                    WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE query_hash = ?2)
+                ''', rows)
+            else:
+                cursor.executemany('''
+                    INSERT INTO jobs (query, query_hash, max_attempts, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+            return cursor.rowcount
+    
+    def read_queries_file(self, path):
+        """Yield the queries in a text file: one per line, blank lines and # comments skipped"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                query = line.strip()
+                if query and not query.startswith('#'):
+                    yield query
+    
+    def claim_job(self, owner=None, lease_seconds=JOB_LEASE_SECONDS):
+        """
+        Atomically take the oldest runnable job and lease it to owner.
+
+        Runnable means pending, or running with an expired lease (its worker
+        died). Running jobs whose lease expired on their last attempt are
+        marked failed instead. The claim counts as an attempt. Returns a dict
+        with id, query, attempts and max_attempts, or None when the queue is
+        empty.
+        """
+        owner = owner or job_owner()
+        try:
+            # Completions may still be queued for the writer
+            self.flush()
+            now = time.time()
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE jobs
+                    SET state = 'failed', last_error = 'lease expired', lease_owner = NULL,
+                        lease_expires_at = NULL, updated_at = ?
+                    WHERE state = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+                ''', (now, now))
+                row = cursor.execute('''
+                    SELECT id, query, attempts, max_attempts
+                    FROM jobs
+                    WHERE state = 'pending' OR (state = 'running' AND lease_expires_at < ?)
+                    ORDER BY id
+                    LIMIT 1
+                ''', (now,)).fetchone()
+                if row is None:
+                    return None
+                cursor.execute('''
+                    UPDATE jobs
+                    SET state = 'running', attempts = attempts + 1, lease_owner = ?,
+                        lease_expires_at = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (owner, now + lease_seconds, now, row[0]))
+            return {
+                'id': row[0],
+                'query': row[1],
+                'attempts': row[2] + 1,
+                'max_attempts': row[3],
+            }
+            
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            return None
+    
+    def complete_job(self, job_id, owner=None, query=None, response=None, timings=None):
+        """
+        Mark a claimed job done. With a response, the interaction (and its
+        timing spans) is stored in the same transaction, so a crash either
+        loses both or keeps both and the job never runs twice.
+        """
+        owner = owner or job_owner()
+        try:
+            row = self.interaction_row(query, self.valid_response(query, response)) if response else None
+            self.submit(self.insert_job_result, job_id, owner, row, timings)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error completing job {job_id}: {str(e)}")
+            return False
+    
+    def insert_job_result(self, cursor, job_id, owner, row, timings):
+        """Finish a job and store its interaction (runs inside a write transaction)"""
+        cursor.execute('''
+            UPDATE jobs
+            SET state = 'done', lease_owner = NULL, lease_expires_at = NULL, last_error = NULL, updated_at = ?
+            WHERE id = ? AND state = 'running' AND lease_owner = ?
+        ''', (time.time(), job_id, owner))
+        if cursor.rowcount == 0:
+            # The lease expired and another worker took the job over: its result wins
+            logger.warning(f"Job {job_id} is no longer leased to {owner}; discarding its result")
+            return
+        if row is not None:
+            interaction_id = self.insert_interaction_with_timings(cursor, row, timings)
+            cursor.execute("UPDATE jobs SET interaction_id = ? WHERE id = ?", (interaction_id, job_id))
+        elif timings:
+            self.insert_timings(cursor, timings)
+    
+    def fail_job(self, job_id, error, owner=None):
+        """Record a failed attempt: the job goes back to pending, or to failed once out of attempts"""
+        owner = owner or job_owner()
+        try:
+            self.submit(self.update_failed_job, job_id, owner, str(error))
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error failing job {job_id}: {str(e)}")
+            return False
+    
+    def update_failed_job(self, cursor, job_id, owner, error):
+        """Release a failed job for retry or mark it failed (runs inside a write transaction)"""
+        cursor.execute('''
+            UPDATE jobs
+            SET state = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                lease_owner = NULL, lease_expires_at = NULL, last_error = ?, updated_at = ?
+            WHERE id = ? AND state = 'running' AND lease_owner = ?
+        ''', (error, time.time(), job_id, owner))
+    
+    def reclaim_dead_leases(self):
+        """
+        Take back the jobs leased to processes on this host that no longer
+        run (a crashed scraper), so a restart resumes with them at once
+        instead of waiting for the lease to expire. The interrupted attempt
+        counts: a job out of attempts is marked failed. Returns the number
+        of jobs reclaimed.
+        """
+        host = socket.gethostname()
+        try:
+            self.flush()
+            with self.lock:
+                owners = [row[0] for row in self.conn.execute(
+                    "SELECT DISTINCT lease_owner FROM jobs WHERE state = 'running'"
+                ).fetchall()]
+            
+            dead = []
+            for owner in owners:
+                owner_host, _, pid = (owner or '').rpartition(':')
+                if owner_host == host and pid.isdigit() and int(pid) != os.getpid() \
+                        and not process_alive(int(pid)):
+                    dead.append(owner)
+            if not dead:
+                return 0
+            
+            with self.transaction() as cursor:
+                cursor.executemany('''
+                    UPDATE jobs
+                    SET state = CASE WHEN attempts < max_attempts THEN 'pending' ELSE 'failed' END,
+                        last_error = 'worker died', lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+                    WHERE state = 'running' AND lease_owner = ?
+                ''', [(time.time(), owner) for owner in dead])
+                reclaimed = cursor.rowcount
+            logger.info(f"Reclaimed {reclaimed} jobs from dead workers {dead}")
+            return reclaimed
+            
+        except Exception as e:
+            logger.error(f"Error reclaiming jobs: {str(e)}")
+            return 0
+    
+    def claimable_job_count(self):
+        """Number of jobs claim_job could hand out now: pending, or running with an expired lease"""
+        try:
+            self.flush()
+            with self.lock:
+                return self.conn.execute('''
+                    SELECT COUNT(*)
+                    FROM jobs
+                    WHERE state = 'pending'
+                        OR (state = 'running' AND lease_expires_at < ? AND attempts < max_attempts)
+                ''', (time.time(),)).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error counting jobs: {str(e)}")
+            return 0
+    
+    def release_jobs(self, owner=None):
+        """
+        Return the jobs leased to owner to pending without counting the
+        interrupted attempt, e.g. on Ctrl+C. Returns the number released.
+        """
+        owner = owner or job_owner()
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE jobs
+                    SET state = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL,
+                        lease_expires_at = NULL, updated_at = ?
+                    WHERE state = 'running' AND lease_owner = ?
+                ''', (time.time(), owner))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error releasing jobs: {str(e)}")
+            return 0
+    
+    def retry_failed_jobs(self, extra_attempts=1):
+        """Give failed jobs extra_attempts more tries; returns the number requeued"""
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    UPDATE jobs
+                    SET state = 'pending', max_attempts = attempts + ?, updated_at = ?
+                    WHERE state = 'failed'
+                ''', (extra_attempts, time.time()))
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error requeueing failed jobs: {str(e)}")
+            return 0
+    
+    def job_counts(self):
+        """Number of jobs in each state"""
+        try:
+            self.flush()
+            with self.lock:
+                rows = self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        except Exception as e:
+            logger.error(f"Error counting jobs: {str(e)}")
+            return {}
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        counts.update(rows)
+        return counts
+    
+    def load_interactions(self, limit=100):
+        """Load interactions from the database"""
+        try:
+            self.flush()
+            with self.lock:
+                rows = self.conn.execute('''
+                    SELECT id, query, response_text, citations, timestamp 
+                    FROM interactions 
+                    ORDER BY timestamp DESC, id DESC 
+                    LIMIT ?
+                ''', (limit,)).fetchall()
+            
+            return [self.interaction_from_row(row) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Error loading interactions: {str(e)}")
+            return []
+    
+    def iter_interactions(self, after=None, page_size=500):
+        """
+        Walk interactions in (timestamp, id) order using keyset pagination.
+
+        after is a (timestamp, id) tuple; only rows strictly after it are
+        returned, so a caller can resume from the last row it saw. Each page
+        is an indexed range scan, so memory and per-page cost stay constant
+        however deep into the history the walk goes. Rows without a
+        timestamp sort first, as SQLite orders NULLs.
+        """
+        columns = "id, query, response_text, citations, timestamp"
+        self.flush()
+        while True:
+            with self.lock:
+                if after is None:
+                    rows = self.conn.execute(f'''
+                        SELECT {columns}
+                        FROM interactions 
+                        ORDER BY timestamp, id 
+                        LIMIT ?
+                    ''', (page_size,)).fetchall()
+                elif after[0] is None:
+                    # A row comparison with NULL is NULL, not true: finish the NULL-timestamp
+                    # rows by id, then continue with the first dated ones
+                    rows = self.conn.execute(f'''
+                        SELECT {columns}
+                        FROM interactions 
+                        WHERE timestamp IS NULL AND id > ?
+                        ORDER BY id 
+                        LIMIT ?
+                    ''', (after[1], page_size)).fetchall()
+                    if len(rows) < page_size:
+                        rows += self.conn.execute(f'''
+                            SELECT {columns}
+                            FROM interactions 
+                            WHERE timestamp IS NOT NULL
+                            ORDER BY timestamp, id 
+                            LIMIT ?
+                        ''', (page_size - len(rows),)).fetchall()
+                else:
+                    rows = self.conn.execute(f'''
+                        SELECT {columns}
+                        FROM interactions 
+                        WHERE (timestamp, id) > (?, ?)
+                        ORDER BY timestamp, id 
+                        LIMIT ?
+                    ''', (after[0], after[1], page_size)).fetchall()
+            
+            for row in rows:
+                yield self.interaction_from_row(row)
+            
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][4], rows[-1][0])
+    
+    def interaction_from_row(self, row):
+        """Convert an (id, query, response_text, citations, timestamp) row to a dict"""
+        return {
+            'id': row[0],
+            'query': row[1],
+            'response_text': row[2],
+            'citations': json.loads(row[3]) if row[3] else [],
+            'timestamp': row[4]
+        }
+    
+    def latest_cached_analysis(self, analysis_type):
+        """Return (covered_max_id, result, state) of the newest cache entry for a type, or None"""
+        with self.lock:
+            return self.conn.execute('''
+                SELECT covered_max_id, result, state FROM analysis_results
+                WHERE analysis_type = ? AND covered_max_id IS NOT NULL
+                ORDER BY covered_max_id DESC, id DESC
+                LIMIT 1
+            ''', (analysis_type,)).fetchone()
+    
+    def build_profile(self, chunk_size=50000):
+        """
+        Return an InteractionProfile covering the full history.
+
+        The last profile is cached in analysis_results, so only interactions
+        added since then are read and folded in.
+        """
+        # NumPy is only loaded once an analysis actually runs
+        import analytics
+        
+        cached = self.latest_cached_analysis('interaction_profile')
+        profile = analytics.InteractionProfile.from_dict(json.loads(cached[2])) if cached else None
+        previous_max_id = profile.max_id if profile else 0
+        
+        reader = self.open_reader()
+        try:
+            profile = analytics.profile_interactions(reader, profile, chunk_size=chunk_size)
+        finally:
+            reader.close()
+        
+        if profile.max_id != previous_max_id:
+            self.submit(
+                self.insert_analysis_result, 'interaction_profile', None,
+                profile.max_id, json.dumps(profile.to_dict()), ANALYSIS_CACHE_KEEP
+            )
+        return profile
+    
+    def cached_analysis(self, analysis_type, build_report):
+        """
+        Return the cached result for analysis_type if no interactions were
+        added since it was computed; otherwise build it from the incrementally
+        updated profile, cache it and evict older entries.
+        """
+        self.flush()
+        with self.lock:
+            max_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM interactions").fetchone()[0]
+        
+        cached = self.latest_cached_analysis(analysis_type)
+        if cached and cached[0] == max_id:
+            logger.debug(f"Analysis cache hit for {analysis_type} at id {max_id}")
+            return json.loads(cached[1])
+        
+        profile = self.build_profile()
+        analysis = build_report(profile)
+        if not analysis:
+            return None
+        
+        # Store analysis result
+        try:
+            self.submit(
+                self.insert_analysis_result, analysis_type, json.dumps(analysis),
+                profile.max_id, None, ANALYSIS_CACHE_KEEP
+            )
+            
+        except Exception as e:
+            logger.error(f"Error storing analysis: {str(e)}")
+            
+        return analysis
+    
+    def clear_analysis_cache(self):
+        """Drop cached analyses, e.g. after existing interactions were modified"""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM analysis_results WHERE covered_max_id IS NOT NULL")
+    
+    def analyze_response_length(self, bins=20):
+        """Analyze response length statistics"""
+        analysis_type = 'response_length' if bins == 20 else f'response_length/bins={bins}'
+        return self.cached_analysis(analysis_type, lambda profile: profile.response_length_report(bins))
+    
+    def analyze_citation_patterns(self, bins=20):
+        """Analyze citation patterns in responses"""
+        analysis_type = 'citation_patterns' if bins == 20 else f'citation_patterns/bins={bins}'
+        return self.cached_analysis(analysis_type, lambda profile: profile.citation_report(bins))
+    
+    def open_reader(self):
+        """Open a separate read-only connection for long-running streaming reads"""
+        # Under WAL the reader sees a consistent snapshot without blocking the writer
+        self.flush()
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+    
+    def iter_export_chunks(self, columns, chunk_size=1000, after_id=0):
+        """
+        Yield lists of interaction rows with id > after_id, reading chunk_size
+        rows at a time from one cursor. Each row is (id, *columns).
+        """
+        # response_html may live compressed in html_blobs: fetch codec and data instead
+        select = [
+            "i.response_html, b.codec, b.data" if column == 'response_html' else f"i.{column}"
+            for column in columns
+        ]
+        html_position = columns.index('response_html') + 1 if 'response_html' in columns else None
+        
+        reader = self.open_reader()
+        try:
+            cursor = reader.execute(f'''
+                SELECT i.id, {', '.join(select)}
+                FROM interactions i LEFT JOIN html_blobs b ON b.hash = i.html_hash
+                WHERE i.id > ?
+                ORDER BY i.id
+            ''', (after_id,))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if html_position is not None:
+                    rows = [
+                        row[:html_position]
+                        + ((decompress_html(row[html_position + 1], row[html_position + 2])
+                            if row[html_position + 2] is not None else row[html_position]),)
+                        + row[html_position + 3:]
+                        for row in rows
+                    ]
+                yield rows
+        finally:
+            reader.close()
+    
+    def export(self, filename, fmt=None, columns=None, chunk_size=1000):
+        """
+        Stream the interactions table to a CSV, JSONL or Parquet file.
+
+        The format comes from fmt or the filename extension; filename may also
+        be an open text stream such as sys.stdout (JSONL unless fmt says
+        'csv'), which is written to but not closed. columns selects
+        and orders the exported columns (see EXPORT_COLUMNS); by default the
+        bulky response_html column is left out. Rows are read and written
+        chunk_size at a time, so memory stays bounded regardless of table
+        size. Returns the number of rows exported, or None on error.
+        """
+        columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+        exporter = None
+        exported = 0
+        try:
+            unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+            if unknown:
+                raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+            
+            exporter = EXPORTERS[exporter_format(filename, fmt)](filename, columns)
+            for rows in self.iter_export_chunks(columns, chunk_size):
+                exporter.write_rows([row[1:] for row in rows])
+                exported += len(rows)
+            
+            logger.info(f"Exported {exported} interactions to {filename}")
+            return exported
+            
+        except Exception as e:
+            logger.error(f"Error exporting to {filename}: {str(e)}")
+            return None
+        finally:
+            if exporter is not None:
+                exporter.close()
+    
+    def export_incremental(self, filename, fmt=None, columns=None, chunk_size=1000):
+        """
+        Append only interactions added since the last export to filename.
+
+        The destination's watermark (last exported id and the file offset at
+        that point) is kept in export_watermarks and advanced after every
+        chunk, once the chunk is fsynced. If a previous run crashed mid-chunk,
+        the file is first truncated back to the recorded offset, so rerunning
+        never duplicates or loses rows. Only CSV and JSONL can be appended.
+        Returns the number of rows appended, or None on error.
+        """
+        columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+        destination = os.path.abspath(filename)
+        exporter = None
+        exported = 0
+        try:
+            fmt = exporter_format(filename, fmt)
+            if fmt == 'parquet':
+                raise ValueError("Incremental export supports CSV and JSONL only")
+            unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+            if unknown:
+                raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+            
+            last_id, file_offset = self.get_export_watermark(destination)
+            current_size = os.path.getsize(filename) if os.path.exists(filename) else 0
+            if current_size < file_offset:
+                # The file was removed or rewritten behind our back: start over
+                logger.warning(f"{filename} is shorter than its export watermark, re-exporting from scratch")
+                last_id, file_offset = 0, 0
+            if current_size > file_offset:
+                # Drop the tail written by a run that crashed before its checkpoint
+                with open(filename, 'r+b') as f:
+                    f.truncate(file_offset)
+            
+            exporter = EXPORTERS[fmt](filename, columns, append=True)
+            for rows in self.iter_export_chunks(columns, chunk_size, after_id=last_id):
+                exporter.write_rows([row[1:] for row in rows])
+                file_offset = exporter.checkpoint()
+                last_id = rows[-1][0]
+                self.set_export_watermark(destination, last_id, file_offset)
+                exported += len(rows)
+            
+            logger.info(f"Appended {exported} new interactions to {filename} (watermark id {last_id})")
+            return exported
+            
+        except Exception as e:
+            logger.error(f"Error in incremental export to {filename}: {str(e)}")
+            return None
+        finally:
+            if exporter is not None:
+                exporter.close()
+    
+    def get_export_watermark(self, destination):
+        """Return (last_id, file_offset) for an export destination, (0, 0) if never exported"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_id, file_offset FROM export_watermarks WHERE destination = ?",
+                (destination,)
+            ).fetchone()
+        return row if row else (0, 0)
+    
+    def set_export_watermark(self, destination, last_id, file_offset):
+        """Record how far an export destination has been written"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO export_watermarks (destination, last_id, file_offset, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(destination) DO UPDATE SET
+                    last_id = excluded.last_id,
+                    file_offset = excluded.file_offset,
+                    updated_at = excluded.updated_at
+            ''', (destination, last_id, file_offset))
+    
+    def search(self, text, limit=20, highlight=True, raw=False):
+        """
+        Full-text search over queries and response texts, best match first.
+
+        By default every word in text must appear (in any order); pass
+        raw=True to use FTS5 query syntax (phrases, OR, NEAR, prefix*)
+        directly. With highlight, each hit carries a snippet of the response
+        with matches wrapped in [ ]; otherwise the full response text.
+        """
+        try:
+            if raw:
+                match = text
+            else:
+                terms = re.findall(r'\w+', text)
+                if not terms:
+                    return []
+                match = " ".join(f'"{term}"' for term in terms)
+            
+            response_column = (
+                "snippet(interactions_fts, 1, '[', ']', '...', 24)" if highlight else "i.response_text"
+            )
+            self.flush()
+            with self.lock:
+                rows = self.conn.execute(f'''
+                    SELECT i.id, i.query, {response_column}, i.timestamp, bm25(interactions_fts) AS score
+                    FROM interactions_fts
+                    JOIN interactions i ON i.id = interactions_fts.rowid
+                    WHERE interactions_fts MATCH ?
+                    ORDER BY score
+                    LIMIT ?
+                ''', (match, limit)).fetchall()
+            
+            return [
+                {
+                    'id': row[0],
+                    'query': row[1],
+                    'snippet' if highlight else 'response_text': row[2],
+                    'timestamp': row[3],
+                    'score': row[4]
+                }
+                for row in rows
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error searching for {text!r}: {str(e)}")
+            return []
+    
+    def rebuild_search_index(self):
+        """Recreate the full-text index from the interactions table"""
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                self.create_search_index(cursor)
+                cursor.execute("INSERT INTO interactions_fts (interactions_fts) VALUES ('rebuild')")
+            logger.info("Rebuilt full-text search index")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding search index: {str(e)}")
+            return False
+    
+    def rebuild_citations(self):
+        """Regenerate the citations table from the interactions.citations JSON column"""
+        try:
+            self.flush()
+            with self.transaction() as cursor:
+                cursor.execute("DELETE FROM citations")
+                self.backfill_citations(cursor)
+            logger.info("Rebuilt citations table")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding citations: {str(e)}")
+            return False
+    
+    def top_cited_domains(self, limit=10):
+        """Most cited domains with citation and distinct-interaction counts"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT domain, COUNT(*) AS citation_count, COUNT(DISTINCT interaction_id)
+                FROM citations
+                GROUP BY domain
+                ORDER BY citation_count DESC, domain
+                LIMIT ?
+            ''', (limit,)).fetchall()
+        return [
+            {'domain': row[0], 'citations': row[1], 'interactions': row[2]}
+            for row in rows
+        ]
+    
+    def domain_trend(self, domain, period='day'):
+        """Citations of a domain per day or per month"""
+        prefix_length = {'day': 10, 'month': 7, 'year': 4}[period]
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT substr(i.timestamp, 1, ?) AS period, COUNT(*)
+                FROM citations c
+                JOIN interactions i ON i.id = c.interaction_id
+                WHERE c.domain = ?
+                GROUP BY period
+                ORDER BY period
+            ''', (prefix_length, url_domain(f"//{domain}") or domain)).fetchall()
+        return [{period: row[0], 'citations': row[1]} for row in rows]
+    
+    def co_cited_domains(self, domain, limit=10):
+        """Domains most often cited in the same response as the given domain"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute('''
+                SELECT other.domain, COUNT(DISTINCT other.interaction_id) AS shared
+                FROM citations c
+                JOIN citations other
+                    ON other.interaction_id = c.interaction_id AND other.domain != c.domain
+                WHERE c.domain = ?
+                GROUP BY other.domain
+                ORDER BY shared DESC, other.domain
+                LIMIT ?
+            ''', (url_domain(f"//{domain}") or domain, limit)).fetchall()
+        return [{'domain': row[0], 'shared_interactions': row[1]} for row in rows]
+    
+    def compact_html(self, batch_size=500, vacuum=False):
+        """
+        Move inline response_html of older rows into compressed, deduplicated
+        html_blobs, then drop blobs no interaction references any more.
+
+        Rows are converted batch_size at a time, each batch in its own
+        transaction, so the job can be interrupted and rerun. Freed pages are
+        reused by SQLite; pass vacuum=True to also shrink the file on disk.
+        Returns a report of the space reclaimed, or None on error.
+        """
+        try:
+            self.flush()
+            size_before = self.database_size()
+            report = {
+                'rows_compacted': 0,
+                'html_bytes_before': 0,
+                'html_bytes_after': 0,
+                'blobs_created': 0,
+                'orphan_blobs_removed': 0,
+            }
+            
+            while True:
+                with self.transaction() as cursor:
+                    rows = cursor.execute('''
+                        SELECT id, response_html FROM interactions
+                        WHERE html_hash IS NULL AND response_html IS NOT NULL AND response_html != ''
+                        LIMIT ?
+                    ''', (batch_size,)).fetchall()
+                    
+                    for interaction_id, html in rows:
+                        digest = html_hash(html)
+                        if not self.html_blob_exists(cursor, digest):
+                            report['html_bytes_after'] += self.insert_html_blob(cursor, digest, html)
+                            report['blobs_created'] += 1
+                        report['html_bytes_before'] += len(html.encode('utf-8'))
+                        cursor.execute(
+                            "UPDATE interactions SET html_hash = ?, response_html = NULL WHERE id = ?",
+                            (digest, interaction_id)
+                        )
+                    report['rows_compacted'] += len(rows)
+                
+                if len(rows) < batch_size:
+                    break
+                logger.info(f"Compacted HTML of {report['rows_compacted']} interactions so far")
+            
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    DELETE FROM html_blobs WHERE hash NOT IN (
+                        SELECT html_hash FROM interactions WHERE html_hash IS NOT NULL
+                        UNION
+                        SELECT html_hash FROM query_cache WHERE html_hash IS NOT NULL
+                    )
+                ''')
+                report['orphan_blobs_removed'] = cursor.rowcount
+            
+            if vacuum:
+                with self.lock:
+                    self.conn.execute("VACUUM")
+                    # In WAL mode the file only shrinks once the WAL is checkpointed
+                    self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            
+            report['html_bytes_reclaimed'] = report['html_bytes_before'] - report['html_bytes_after']
+            report['db_bytes_before'] = size_before
+            report['db_bytes_after'] = self.database_size()
+            logger.info(
+                f"Compacted HTML of {report['rows_compacted']} interactions: "
+                f"{report['html_bytes_before']} -> {report['html_bytes_after']} bytes"
+            )
+            return report
+            
+        except Exception as e:
+            logger.error(f"Error compacting HTML: {str(e)}")
+            return None
+    
+    def reextract(self, workers=None, batch_size=500, stale_only=False):
+        """
+        Regenerate response_text, citations, code_blocks and tables of stored
+        interactions from their response HTML with the rules in reextract.py.
+
+        HTML is streamed from a read-only connection batch_size rows at a
+        time, decompressed and parsed in a pool of worker processes (all
+        cores by default; workers=1 parses in this process), and written back
+        one transaction per batch together with the matching citations rows.
+        With stale_only, rows already processed by the current
+        EXTRACTOR_VERSION are skipped. Running aggregates and cached analyses
+        are refreshed at the end. Returns a report, or None on error.
+        """
+        # BeautifulSoup and multiprocessing are only loaded for this job
+        from concurrent.futures import ProcessPoolExecutor
+        import reextract
+        
+        workers = workers or os.cpu_count() or 1
+        report = {'rows_updated': 0, 'rows_failed': 0}
+        started = time.time()
+        try:
+            self.flush()
+            batches = self.iter_stored_html(batch_size, stale_only)
+            if workers == 1:
+                for batch in batches:
+                    self.write_reextracted(*reextract.reextract_rows(batch), report)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # Keep a bounded number of batches in flight so memory stays flat
+                    pending = set()
+                    for batch in batches:
+                        pending.add(pool.submit(reextract.reextract_rows, batch))
+                        if len(pending) >= workers * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                self.write_reextracted(*future.result(), report)
+                    for future in pending:
+                        self.write_reextracted(*future.result(), report)
+            
+            self.rebuild_aggregates()
+            report['seconds'] = time.time() - started
+            logger.info(
+                f"Re-extracted {report['rows_updated']} interactions in {report['seconds']:.1f}s "
+                f"({report['rows_failed']} failed)"
+            )
+            return report
+            
+        except Exception as e:
+            logger.error(f"Error re-extracting interactions: {str(e)}")
+            return None
+    
+    def iter_stored_html(self, batch_size=500, stale_only=False):
+        """Yield batches of (id, inline_html, codec, data) for interactions that have HTML"""
+        import reextract
+        
+        reader = self.open_reader()
+        try:
+            cursor = reader.execute(f'''
+                SELECT i.id, i.response_html, b.codec, b.data
+                FROM interactions i LEFT JOIN html_blobs b ON b.hash = i.html_hash
+                WHERE (b.data IS NOT NULL OR (i.response_html IS NOT NULL AND i.response_html != ''))
+                {"AND (i.extractor_version IS NULL OR i.extractor_version < ?)" if stale_only else ""}
+                ORDER BY i.id
+            ''', (reextract.EXTRACTOR_VERSION,) if stale_only else ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            reader.close()
+    
+    def write_reextracted(self, results, failed_ids, report):
+        """Write one batch of reextract_rows() results and their citations in a single transaction"""
+        import reextract
+        
+        if failed_ids:
+            logger.warning(f"Could not re-extract interactions {failed_ids[:10]}{'...' if len(failed_ids) > 10 else ''}")
+        report['rows_failed'] += len(failed_ids)
+        if not results:
+            return
+        
+        with self.transaction() as cursor:
+            # An empty extraction keeps the text scraped live rather than erasing it
+            cursor.executemany('''
+                UPDATE interactions SET
+                    response_text = COALESCE(NULLIF(?, ''), response_text),
+                    citations = ?,
+                    code_blocks = ?,
+                    tables = ?,
+                    extractor_version = ?
+                WHERE id = ?
+            ''', [
+                (text, citations, code_blocks, tables, reextract.EXTRACTOR_VERSION, interaction_id)
+                for interaction_id, text, citations, code_blocks, tables in results
+            ])
+            cursor.executemany(
+                "DELETE FROM citations WHERE interaction_id = ?",
+                [(result[0],) for result in results]
+            )
+            self.insert_citations(cursor, [
+                (result[0], position, url, url_domain(url))
+                for result in results
+                for position, url in enumerate(json.loads(result[2]))
+            ])
+        report['rows_updated'] += len(results)
+    
+    def database_size(self):
+        """Bytes in use by the database, excluding free pages"""
+        with self.lock:
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist_count = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+    
+    def export_to_csv(self, filename='bing_chat_data.csv', columns=None, chunk_size=1000):
+        """Export interactions to CSV file"""
+        return bool(self.export(filename, 'csv', columns, chunk_size))
+    
+    def export_to_jsonl(self, filename='bing_chat_data.jsonl', columns=None, chunk_size=1000):
+        """Export interactions to a JSON Lines file"""
+        return bool(self.export(filename, 'jsonl', columns, chunk_size))
+    
+    def export_to_parquet(self, filename='bing_chat_data.parquet', columns=None, chunk_size=10000):
+        """Export interactions to a Parquet file (requires pyarrow)"""
+        return bool(self.export(filename, 'parquet', columns, chunk_size))
@@ -0,0 +1,128 @@
+"""Incremental file writers used by DataProcessor's streaming exports"""
+import csv
+import json
+import os
+
+
+JSON_COLUMNS = ('citations', 'code_blocks', 'tables')
+
+
+def is_stream(path):
+    """Whether an export destination is an open text stream (e.g. sys.stdout) rather than a path"""
+    return hasattr(path, 'write')
+
+
+class CsvExporter:
+    """Write rows to a CSV file (or an open text stream, left open) chunk by chunk"""
+
+    def __init__(self, path, columns, append=False):
+        self.columns = list(columns)
+        if is_stream(path):
+            write_header = True
+            self.file, self.owns_file = path, False
+        else:
+            write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+            self.file, self.owns_file = open(path, 'a' if append else 'w', newline='', encoding='utf-8'), True
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(self.columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def checkpoint(self):
+        """Make everything written so far durable and return the file offset"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class JsonlExporter:
+    """Write rows to a JSON Lines file (or an open text stream, left open) chunk by chunk"""
+
+    def __init__(self, path, columns, append=False):
+        self.columns = list(columns)
+        if is_stream(path):
+            self.file, self.owns_file = path, False
+        else:
+            self.file, self.owns_file = open(path, 'a' if append else 'w', encoding='utf-8'), True
+
+    def write_rows(self, rows):
+        lines = []
+        for row in rows:
+            record = dict(zip(self.columns, row))
+            # citations, code blocks and tables are stored as JSON strings; emit them as real lists
+            for column in JSON_COLUMNS:
+                if record.get(column):
+                    record[column] = json.loads(record[column])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        if lines:
+            self.file.write("\n".join(lines) + "\n")
+
+    def checkpoint(self):
+        """Make everything written so far durable and return the file offset"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class ParquetExporter:
+    """Write rows to a Parquet file, one row group per chunk (requires pyarrow)"""
+
+    def __init__(self, path, columns, append=False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+        if append:
+            raise ValueError("Parquet files cannot be appended to")
+
+        self.pa = pa
+        self.columns = list(columns)
+        self.schema = pa.schema([
+            (column, pa.int64() if column == 'id' else pa.string())
+            for column in self.columns
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        arrays = [list(values) for values in zip(*rows)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORTERS = {
+    'csv': CsvExporter,
+    'jsonl': JsonlExporter,
+    'parquet': ParquetExporter,
+}
+
+
+def exporter_format(filename, fmt=None):
+    """Resolve the export format from an explicit name or the file extension"""
+    if fmt is None and is_stream(filename):
+        fmt = 'jsonl'
+    if fmt is None:
+        fmt = os.path.splitext(filename)[1].lstrip('.').lower()
+        if fmt == 'json':
+            fmt = 'jsonl'
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {fmt!r} (expected one of {', '.join(EXPORTERS)})")
+    return fmt
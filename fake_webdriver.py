@@ -0,0 +1,576 @@
+"""
+In-memory stand-in for the Selenium WebDriver subset BingChatScraper uses.
+
+FakeDriver holds a small DOM of FakeElements and answers find_elements,
+execute_script (for the scraper's own scripts, run as Python handlers),
+get_attribute, .text, send_keys, click and save_screenshot without a
+browser, so the scraper's control flow can be exercised and timed in
+microseconds. Pass it to BingChatScraper(driver=...) to skip Chrome:
+
+    driver = FakeDriver.chat_page()
+    scraper = BingChatScraper(None, None, driver=driver)
+    scraper.send_query("Hello")
+
+Every command goes through FakeDriver.execute, like Selenium's, so wrapping
+it counts round trips the same way for the fake and a real driver.
+
+An async wait that does not settle blocks for its full max wait, as in a
+browser. Give the driver a FakeClock and substitute it for the scraper's
+time module to make such waits (and the scraper's sleeps) instant:
+
+    driver = FakeDriver.chat_page(clock=FakeClock())
+    with mock.patch.object(bing_chat_scraper, 'time', driver.clock):
+        scraper.send_query("Hello")
+"""
+import functools
+import html
+import re
+import time
+from collections import Counter
+from urllib.parse import urljoin
+
+from selenium.common.exceptions import (
+    InvalidSelectorException,
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+import bing_chat_scraper
+
+
+SUBMIT_KEYS = (Keys.RETURN, Keys.ENTER)
+# Modifier and editing keys from Keys that type no text
+CONTROL_KEYS = frozenset(
+    value for name, value in vars(Keys).items() if name.isupper() and len(value) == 1
+)
+BLOCK_TAGS = frozenset(('div', 'p', 'pre', 'li', 'ul', 'ol', 'section', 'article', 'body', 'html', 'table', 'tr'))
+TYPING_SELECTOR = "[class*='typing'], [class*='loading'], [class*='generating'], .animate-pulse"
+AI_MESSAGE_SELECTOR = ".group\\/ai-message-item"
+USER_MESSAGE_SELECTOR = "[data-content='user-message']"
+
+IDENTIFIER = r'(?:\\.|[\w-])+'
+COMPOUND_PART = re.compile(
+    rf"""(?P<tag>^\*|^[a-zA-Z][\w-]*)
+       |\#(?P<id>{IDENTIFIER})
+       |\.(?P<cls>{IDENTIFIER})
+       |\[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$~]?=)\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<bare>[^\]\s]+)))?\s*\]""",
+    re.VERBOSE,
+)
+
+
+def unescape(identifier):
+    return re.sub(r'\\(.)', r'\1', identifier)
+
+
+def split_outside_brackets(text, separator):
+    """Split on separator characters that are not inside [...] or quotes"""
+    parts, current, depth, quote = [], '', 0, None
+    for char in text:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '\'"':
+            quote = char
+        elif char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif depth == 0 and re.match(separator, char):
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_compound(compound):
+    """Parse one compound selector (e.g. textarea[placeholder*='Ask']) into match conditions"""
+    conditions = []
+    position = 0
+    while position < len(compound):
+        match = COMPOUND_PART.match(compound, position)
+        if not match or match.end() == position:
+            raise InvalidSelectorException(f"Unsupported selector: {compound!r}")
+        if match.group('tag'):
+            conditions.append(('tag', match.group('tag').lower()))
+        elif match.group('id'):
+            conditions.append(('attr', 'id', '=', unescape(match.group('id'))))
+        elif match.group('cls'):
+            conditions.append(('attr', 'class', '~=', unescape(match.group('cls'))))
+        else:
+            value = next((v for v in match.group('sq', 'dq', 'bare') if v is not None), None)
+            conditions.append(('attr', match.group('attr'), match.group('op'), value))
+        position = match.end()
+    return conditions
+
+
+@functools.lru_cache(maxsize=256)
+def parse_selector(selector):
+    """Parse a selector list into [[compound conditions, ...] per descendant chain, ...]"""
+    return [
+        [parse_compound(compound) for compound in split_outside_brackets(chain, r'\s')]
+        for chain in split_outside_brackets(selector, ',')
+    ]
+
+
+def matches_compound(element, conditions):
+    for condition in conditions:
+        if condition[0] == 'tag':
+            if condition[1] != '*' and element.tag != condition[1]:
+                return False
+            continue
+        _, name, op, expected = condition
+        actual = element.attributes.get(name)
+        if actual is None:
+            return False
+        if op is None:
+            continue
+        actual = str(actual)
+        if op == '=' and actual != expected:
+            return False
+        if op == '*=' and expected not in actual:
+            return False
+        if op == '^=' and not actual.startswith(expected):
+            return False
+        if op == '$=' and not actual.endswith(expected):
+            return False
+        if op == '~=' and expected not in actual.split():
+            return False
+    return True
+
+
+def matches_chain(element, chain):
+    """Whether element matches the last compound and its ancestors the earlier ones"""
+    if not matches_compound(element, chain[-1]):
+        return False
+    remaining = chain[:-1]
+    ancestor = element.parent
+    while remaining and ancestor is not None:
+        if matches_compound(ancestor, remaining[-1]):
+            remaining = remaining[:-1]
+        ancestor = ancestor.parent
+    return not remaining
+
+
+class FakeElement:
+    """A DOM node with the WebElement methods the scraper calls"""
+
+    def __init__(self, tag, attributes=None, text='', children=()):
+        self.tag = tag.lower()
+        self.attributes = dict(attributes or {})
+        self.own_text = text
+        self.parent = None
+        self.children = []
+        self.driver = None
+        self.clicks = 0
+        # Called with (element,) on click and (element, value) on Enter
+        self.on_click = None
+        self.on_submit = None
+        for child in children:
+            self.append(child)
+
+    def __repr__(self):
+        return f"<FakeElement {self.tag} {self.attributes}>"
+
+    # --- tree ---------------------------------------------------------------
+
+    def append(self, child):
+        child.remove()
+        child.parent = self
+        self.children.append(child)
+        return child
+
+    def remove(self):
+        if self.parent is not None:
+            self.parent.children.remove(self)
+            self.parent = None
+
+    def iter_descendants(self):
+        """Descendants in document order"""
+        stack = self.children[::-1]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(reversed(element.children))
+
+    def select(self, selector):
+        chains = parse_selector(selector)
+        found = []
+        for element in self.iter_descendants():
+            for chain in chains:
+                if matches_chain(element, chain):
+                    found.append(element)
+                    break
+        return found
+
+    @property
+    def root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    @property
+    def connected(self):
+        return self.driver is not None and self.root is self.driver.document
+
+    @property
+    def visible(self):
+        node = self
+        while node is not None:
+            style = node.attributes.get('style', '').replace(' ', '')
+            if 'hidden' in node.attributes or 'display:none' in style:
+                return False
+            node = node.parent
+        return True
+
+    @property
+    def inner_text(self):
+        if not self.visible:
+            return ''
+        parts = [self.own_text] + [child.inner_text for child in self.children]
+        separator = '\n' if any(child.tag in BLOCK_TAGS for child in self.children) else ''
+        return separator.join(part for part in parts if part)
+
+    @property
+    def outer_html(self):
+        attributes = ''.join(
+            f' {name}' if value is True else f' {name}="{html.escape(str(value))}"'
+            for name, value in self.attributes.items()
+        )
+        inner = html.escape(self.own_text) + ''.join(child.outer_html for child in self.children)
+        return f"<{self.tag}{attributes}>{inner}</{self.tag}>"
+
+    # --- WebElement API -------------------------------------------------------
+
+    def command(self, command_name, **params):
+        if self.driver is None:
+            raise StaleElementReferenceException("Element is not attached to a driver")
+        return self.driver.execute(command_name, dict(params, element=self))
+
+    @property
+    def text(self):
+        return self.command('getElementText')
+
+    def get_attribute(self, name):
+        return self.command('getElementAttribute', name=name)
+
+    def find_element(self, by=By.ID, value=None):
+        return self.command('findChildElement', using=by, value=value)
+
+    def find_elements(self, by=By.ID, value=None):
+        return self.command('findChildElements', using=by, value=value)
+
+    def is_displayed(self):
+        return self.command('isElementDisplayed')
+
+    def is_enabled(self):
+        return self.command('isElementEnabled')
+
+    def click(self):
+        return self.command('clickElement')
+
+    def send_keys(self, *values):
+        return self.command('sendKeysToElement', text=''.join(values))
+
+    def clear(self):
+        return self.command('clearElement')
+
+
+class FakeClock:
+    """Virtual stand-in for the time module: time only moves when something sleeps"""
+
+    def __init__(self, start=1_700_000_000.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class FakeDriver:
+    """
+    WebDriver double over an in-memory DOM.
+
+    execute_script understands the scraper's module-level scripts and the
+    small inline ones it sends; anything else raises JavascriptException so
+    the scraper's fallbacks run. Screenshots are recorded by filename rather
+    than written. Async scripts resolve against the DOM as it is when they
+    are called; one that would have to wait sleeps on clock (the real time
+    module by default, or a FakeClock) for its full timeout.
+    """
+
+    def __init__(self, document=None, current_url='about:blank', clock=None):
+        self.document = document or FakeElement('html', children=[FakeElement('body')])
+        self.clock = clock or time
+        self.current_url = current_url
+        self.commands = Counter()
+        self.screenshots = []
+        self.visited = []
+        self.script_timeout = None
+        self.observer_installed = False
+        self.closed = False
+        self.scripts = {
+            bing_chat_scraper.EXTRACT_RESPONSE_JS: self.script_extract_response,
+            bing_chat_scraper.INSTALL_COMPLETION_OBSERVER_JS: self.script_install_observer,
+            bing_chat_scraper.STREAM_STATE_JS: self.script_stream_state,
+            bing_chat_scraper.FOCUS_INPUT_ELEMENT_JS: self.script_focus_input,
+            bing_chat_scraper.RESOLVE_INPUT_SELECTOR_JS: self.script_resolve_selector,
+            "arguments[0].scrollIntoView({block: 'center'});": lambda element: None,
+            "arguments[0].click();": lambda element: self.click_element(element),
+            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})": lambda: None,
+        }
+        self.async_scripts = {
+            bing_chat_scraper.WAIT_FOR_SETTLED_JS: self.script_wait_for_settled,
+        }
+        self.adopt(self.document)
+
+    @classmethod
+    def chat_page(cls, respond=None, current_url='https://www.bing.com/chat', clock=None):
+        """
+        A driver showing a minimal chat page.
+
+        Pressing Enter in its textarea adds a user message and, immediately,
+        a complete AI message built from respond(query), which returns
+        {'paragraphs': [...], 'links': [...]} (by default one paragraph
+        echoing the query and no links).
+        """
+        conversation = FakeElement('div', {'id': 'conversation'})
+        chat_input = FakeElement('textarea', {'placeholder': 'Ask me anything...', 'value': ''})
+        driver = cls(FakeElement('html', children=[
+            FakeElement('body', children=[conversation, chat_input]),
+        ]), current_url=current_url, clock=clock)
+        respond = respond or (lambda query: {'paragraphs': [f"You asked: {query}"], 'links': []})
+
+        def submit(element, query):
+            answer = respond(query)
+            driver.adopt(conversation.append(
+                FakeElement('div', {'data-content': 'user-message'}, text=query)
+            ))
+            message = FakeElement('div', {'class': 'group/ai-message-item'})
+            for paragraph in answer.get('paragraphs', []):
+                message.append(FakeElement('p', text=paragraph))
+            for href in answer.get('links', []):
+                message.append(FakeElement('a', {'href': href}, text=href))
+            driver.adopt(conversation.append(message))
+            element.attributes['value'] = ''
+
+        chat_input.on_submit = submit
+        return driver
+
+    def adopt(self, element):
+        """Attach element (and its subtree) to this driver and return it"""
+        element.driver = self
+        for descendant in element.iter_descendants():
+            descendant.driver = self
+        return element
+
+    # --- command dispatch -------------------------------------------------------
+
+    def execute(self, command, params=None):
+        """Run one command; the single entry point every call goes through"""
+        self.commands[command] += 1
+        params = dict(params or {})
+        element = params.pop('element', None)
+        if element is not None:
+            if not element.connected:
+                raise StaleElementReferenceException(f"{element!r} is no longer attached to the DOM")
+            params['element'] = element
+        return getattr(self, 'command_' + command)(**params)
+
+    def command_get(self, url):
+        self.current_url = url
+        self.visited.append(url)
+
+    def command_findElements(self, using, value, element=None):
+        scope = element or self.document
+        if using == By.CSS_SELECTOR:
+            return scope.select(value)
+        if using == By.TAG_NAME:
+            return [node for node in scope.iter_descendants() if node.tag == value.lower()]
+        if using in (By.ID, By.NAME, By.CLASS_NAME):
+            attribute = {By.ID: 'id', By.NAME: 'name', By.CLASS_NAME: 'class'}[using]
+            return [
+                node for node in scope.iter_descendants()
+                if value in (node.attributes.get(attribute, '') or '').split()
+                or node.attributes.get(attribute) == value
+            ]
+        raise InvalidSelectorException(f"Locator strategy not supported by FakeDriver: {using}")
+
+    def command_findElement(self, using, value, element=None):
+        found = self.command_findElements(using, value, element)
+        if not found:
+            raise NoSuchElementException(f"No element matches {using}={value!r}")
+        return found[0]
+
+    command_findChildElements = command_findElements
+    command_findChildElement = command_findElement
+
+    def command_getElementText(self, element):
+        return element.inner_text
+
+    def command_getElementAttribute(self, element, name):
+        if name == 'outerHTML':
+            return element.outer_html
+        if name == 'innerHTML':
+            return ''.join(child.outer_html for child in element.children)
+        if name in ('innerText', 'textContent'):
+            return element.inner_text
+        value = element.attributes.get(name)
+        if value is True:
+            return 'true'
+        if name in ('href', 'src') and value is not None:
+            return urljoin(self.current_url, value)
+        return value
+
+    def command_isElementDisplayed(self, element):
+        return element.visible
+
+    def command_isElementEnabled(self, element):
+        return 'disabled' not in element.attributes
+
+    def command_clickElement(self, element):
+        self.click_element(element)
+
+    def command_sendKeysToElement(self, element, text):
+        for char in text:
+            if char in SUBMIT_KEYS:
+                if element.on_submit is not None:
+                    element.on_submit(element, element.attributes.get('value', ''))
+            elif char not in CONTROL_KEYS:
+                element.attributes['value'] = element.attributes.get('value', '') + char
+
+    def command_clearElement(self, element):
+        element.attributes['value'] = ''
+
+    def command_executeScript(self, script, args):
+        handler = self.scripts.get(script)
+        if handler is None:
+            raise JavascriptException(f"FakeDriver cannot run script: {script.strip()[:60]!r}")
+        return handler(*args)
+
+    def command_executeAsyncScript(self, script, args):
+        handler = self.async_scripts.get(script)
+        if handler is None:
+            raise JavascriptException(f"FakeDriver cannot run async script: {script.strip()[:60]!r}")
+        return handler(*args)
+
+    def command_setScriptTimeout(self, seconds):
+        self.script_timeout = seconds
+
+    def command_screenshot(self, filename):
+        self.screenshots.append(filename)
+        return True
+
+    def command_quit(self):
+        self.closed = True
+
+    # --- WebDriver API ------------------------------------------------------------
+
+    def get(self, url):
+        self.execute('get', {'url': url})
+
+    def find_elements(self, by=By.ID, value=None):
+        return self.execute('findElements', {'using': by, 'value': value})
+
+    def find_element(self, by=By.ID, value=None):
+        return self.execute('findElement', {'using': by, 'value': value})
+
+    def execute_script(self, script, *args):
+        return self.execute('executeScript', {'script': script, 'args': args})
+
+    def execute_async_script(self, script, *args):
+        return self.execute('executeAsyncScript', {'script': script, 'args': args})
+
+    def set_script_timeout(self, seconds):
+        self.execute('setScriptTimeout', {'seconds': seconds})
+
+    def save_screenshot(self, filename):
+        return self.execute('screenshot', {'filename': filename})
+
+    def quit(self):
+        self.execute('quit')
+
+    # --- page behaviour -------------------------------------------------------------
+
+    def click_element(self, element):
+        element.clicks += 1
+        if element.tag == 'input' and element.attributes.get('type') == 'checkbox':
+            element.attributes['checked'] = True
+        if element.on_click is not None:
+            element.on_click(element)
+
+    def ai_messages(self):
+        return self.document.select(AI_MESSAGE_SELECTOR)
+
+    def message_count(self):
+        return len(self.document.select(USER_MESSAGE_SELECTOR)) + len(self.ai_messages())
+
+    def latest_paragraphs(self):
+        messages = self.ai_messages()
+        if not messages:
+            return []
+        return [p.inner_text for p in messages[-1].select('p')]
+
+    # --- script handlers ------------------------------------------------------------
+
+    def script_extract_response(self):
+        messages = self.ai_messages()
+        if not messages:
+            return None
+        latest = messages[-1]
+        return {
+            'paragraphs': [p.inner_text for p in latest.select('p')],
+            'links': [
+                {'href': self.command_getElementAttribute(a, 'href'), 'text': a.inner_text}
+                for a in latest.select('a')
+            ],
+            'code_blocks': [pre.inner_text for pre in latest.select('pre')],
+            'text': latest.inner_text,
+            'html': latest.outer_html,
+        }
+
+    def script_install_observer(self, reset=False):
+        self.observer_installed = True
+        return True
+
+    def script_wait_for_settled(self, quiet_ms, max_wait_ms, expected_messages):
+        text = ' '.join(self.latest_paragraphs()).strip()
+        arrived = bool(text) and self.message_count() >= expected_messages
+        settled = arrived and not self.document.select(TYPING_SELECTOR)
+        if not settled:
+            # Nothing changes while the script waits: it times out, as in a browser
+            self.clock.sleep(max_wait_ms / 1000)
+        return {
+            'settled': settled,
+            'length': len(text),
+            'first_text_ms': 0 if arrived else None,
+            'gaps_ms': [],
+        }
+
+    def script_stream_state(self):
+        return {
+            'text': '\n'.join(text.strip() for text in self.latest_paragraphs() if text.strip()),
+            'typing': bool(self.document.select(TYPING_SELECTOR)),
+            'count': self.message_count(),
+        }
+
+    def script_focus_input(self, element):
+        return bool(
+            element is not None and element.connected and element.visible
+            and 'disabled' not in element.attributes
+        )
+
+    def script_resolve_selector(self, selector):
+        for element in self.document.select(selector):
+            if 'disabled' not in element.attributes and element.visible:
+                return element
+        return None
@@ -0,0 +1,32 @@
+"""Compression and content addressing of stored response HTML"""
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: fall back to zlib for stored HTML
+    zstandard = None
+
+
+def compress_html(html):
+    """Compress HTML for the html_blobs table, returning (codec, data)"""
+    raw = html.encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=9).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress_html(codec, data):
+    """Inverse of compress_html"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("HTML was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    raise ValueError(f"Unknown HTML codec: {codec}")
+
+
+def html_hash(html):
+    """Content address of a piece of HTML"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
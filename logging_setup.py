@@ -0,0 +1,175 @@
+"""
+Logging configuration, applied by the entry points rather than on import.
+
+Modules log through named loggers, one per component:
+
+    bing_chat_scraper             browser automation, login and main()
+    bing_chat_scraper.completion  per-poll progress while an answer streams in
+    data_processor                storage, analysis and export
+
+Calls on those loggers only put the record on a queue; a QueueListener
+thread formats it and does the file and console I/O, so logging never
+blocks query processing. Levels can be set per component, in code or with
+the BING_LOG_LEVELS environment variable:
+
+    BING_LOG_LEVELS="bing_chat_scraper.completion=DEBUG,data_processor=WARNING"
+"""
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+from datetime import datetime
+
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# LogRecord attributes that are not user-supplied `extra` fields
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+# The listener started by the last setup_logging() call
+active_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, with any `extra` fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        # Tracebacks are already part of the message: QueueHandler formats them in
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def gzip_rotator(source, destination):
+    """Rotate a log file by compressing it to destination"""
+    with open(source, 'rb') as f_in, gzip.open(destination, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class CompressedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    TimedRotatingFileHandler whose backups are <file>.<date suffix>.gz.
+
+    With a namer set, the stock getFilesToDelete matches backups by the
+    file name's stem, so foo.log and foo.jsonl would delete each other's
+    backups; this one only considers backups of its own file.
+    """
+
+    def getFilesToDelete(self):
+        directory, base = os.path.split(self.baseFilename)
+        prefix = base + '.'
+        backups = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith(prefix) and name.endswith('.gz')
+            and self.extMatch.match(name[len(prefix):-len('.gz')])
+        )
+        if len(backups) <= self.backupCount:
+            return []
+        return [os.path.join(directory, name) for name in backups[:len(backups) - self.backupCount]]
+
+
+def rotating_handler(filename, max_bytes, backup_count, when, compress):
+    """File handler rotating at max_bytes, or on the `when` schedule of TimedRotatingFileHandler"""
+    if when:
+        handler_class = CompressedTimedRotatingFileHandler if compress \
+            else logging.handlers.TimedRotatingFileHandler
+        handler = handler_class(filename, when=when, backupCount=backup_count, encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+    if compress:
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = gzip_rotator
+    return handler
+
+
+def parse_levels(spec):
+    """{logger name: level} from a "name=LEVEL,name=LEVEL" string"""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file="bing_scraper.log", level=logging.INFO, levels=None, json_file=None,
+                  max_bytes=10 * 1024 * 1024, backup_count=5, when=None, compress=True, console=True):
+    """
+    Log to a rotating log_file and the console with UTF-8 encoding (to handle
+    emojis), and optionally to json_file as JSON Lines.
+
+    Files rotate at max_bytes, or on a schedule when `when` is given (e.g.
+    'midnight', see TimedRotatingFileHandler), keeping backup_count old
+    files, gzip-compressed when compress is set. level applies to every
+    logger; levels ({logger name: level}, then BING_LOG_LEVELS) overrides it
+    per component. Records pass through a queue to a listener thread, which
+    is stopped (and drained) at exit. Calling this again replaces the
+    previous configuration. Returns the listener.
+    """
+    global active_listener
+
+    if sys.platform.startswith('win'):
+        os.system('chcp 65001 >nul 2>&1')  # Set Windows console to UTF-8
+
+    handlers = []
+    if log_file:
+        handler = rotating_handler(log_file, max_bytes, backup_count, when, compress)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(handler)
+    if json_file:
+        handler = rotating_handler(json_file, max_bytes, backup_count, when, compress)
+        handler.setFormatter(JsonLinesFormatter())
+        handlers.append(handler)
+    if console:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(handler)
+
+    # Unbounded, so a slow disk delays the listener rather than the caller
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+
+    component_levels = dict(levels or {})
+    component_levels.update(parse_levels(os.getenv('BING_LOG_LEVELS', '')))
+    for name, component_level in component_levels.items():
+        logging.getLogger(name).setLevel(component_level)
+
+    # Records already queued for a previous configuration are written out by its listener
+    stop_logging()
+    active_listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    active_listener.start()
+    atexit.register(stop_logging)
+    return active_listener
+
+
+def stop_logging():
+    """Write out queued records, stop the listener thread and close the log files"""
+    global active_listener
+
+    listener, active_listener = active_listener, None
+    if listener is None:
+        return
+    atexit.unregister(stop_logging)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
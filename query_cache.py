@@ -0,0 +1,103 @@
+"""Answer cache for repeated prompts: an in-process LRU in front of the SQLite store"""
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 24 * 3600
+
+
+def normalize_query(query):
+    """Canonical form of a prompt: NFKC, case-folded, whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
+
+
+def query_hash(query):
+    """Cache key of a prompt (sha256 of its normalized form)"""
+    return hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+
+
+class QueryCache:
+    """
+    Cached send_query results keyed by normalized prompt.
+
+    Lookups try an in-process LRU of up to max_entries answers first and the
+    store (a DataProcessor, optional) second; store hits are promoted into
+    the LRU. An entry is fresh while it is younger than the ttl given to
+    get(), or the cache's default ttl; the store keeps entries for the
+    default ttl only. Hit and miss counters are in stats().
+    """
+
+    def __init__(self, store=None, max_entries=256, ttl=DEFAULT_TTL):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, query, ttl=None):
+        """Return a copy of the fresh cached response for query, or None"""
+        key = query_hash(query)
+        oldest = time.time() - (self.ttl if ttl is None else ttl)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= oldest:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return dict(entry[1])
+
+        entry = self.store.get_cached_response(key, oldest) if self.store is not None else None
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.store_hits += 1
+            self.remember(key, entry)
+        return dict(entry[1])
+
+    def put(self, query, response):
+        """Cache response for query in memory and in the store"""
+        key = query_hash(query)
+        stored_at = time.time()
+        with self.lock:
+            self.remember(key, (stored_at, dict(response)))
+        if self.store is not None:
+            # Entries older than the default ttl are dropped from the store as new ones arrive
+            self.store.cache_response(key, query, response, stored_at, expire_before=stored_at - self.ttl)
+
+    def remember(self, key, entry):
+        """Insert into the LRU, evicting the least recently used entries (caller holds the lock)"""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, query=None):
+        """Forget one prompt, or everything when query is None"""
+        key = query_hash(query) if query is not None else None
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+        if self.store is not None:
+            self.store.clear_query_cache(key)
+
+    def stats(self):
+        with self.lock:
+            hits = self.memory_hits + self.store_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+            }
@@ -0,0 +1,126 @@
+"""
+Offline re-extraction of stored answers from their response HTML.
+
+The stored HTML is the ground truth; response_text and citations were
+produced by the live extraction rules when the answer was scraped. The
+functions here re-derive them (plus code blocks and tables) with
+BeautifulSoup, without a browser, and run in worker processes under
+DataProcessor.reextract. Run this module to reprocess a database:
+
+    python reextract.py --db bing_chat_data.db --stale-only
+"""
+import argparse
+import json
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from html_codec import decompress_html
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:  # optional: the stdlib parser is slower but gives the same results here
+    HTML_PARSER = 'html.parser'
+
+
+# Bump whenever the rules below change, so stale-only runs reprocess every row
+EXTRACTOR_VERSION = 1
+
+# Relative links in stored HTML resolve against the chat page, as they did live
+BASE_URL = 'https://www.bing.com/chat'
+
+
+def element_text(element):
+    """Approximate innerText: <br> breaks lines, other whitespace runs collapse"""
+    for br in element.find_all('br'):
+        br.replace_with('\n')
+    lines = (' '.join(line.split()) for line in element.get_text().split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def parse_response_html(html):
+    """
+    Extract text, citations, code blocks and tables from the outerHTML of
+    one AI message, following the same rules as extract_response.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    message = soup.find(class_='group/ai-message-item') or soup
+
+    # Read code and tables before element_text() rewrites <br>s in place
+    code_blocks = [pre.get_text() for pre in message.find_all('pre')]
+    tables = [
+        [
+            [element_text(cell) for cell in row.find_all(['th', 'td'])]
+            for row in table.find_all('tr')
+        ]
+        for table in message.find_all('table')
+    ]
+    citations = [
+        url for url in (urljoin(BASE_URL, a['href']) for a in message.find_all('a', href=True))
+        if 'http' in url
+    ]
+
+    text = "\n".join(
+        paragraph for paragraph in (element_text(p) for p in message.find_all('p')) if paragraph
+    )
+    if not text:
+        text = element_text(message)
+
+    return {
+        'text': text,
+        'citations': citations,
+        'code_blocks': code_blocks,
+        'tables': tables,
+    }
+
+
+def reextract_rows(rows):
+    """
+    Worker entry point: parse a batch of (id, inline_html, codec, data) rows.
+
+    Returns (results, failed_ids) where each result is an
+    (id, text, citations_json, code_blocks_json, tables_json) tuple.
+    """
+    results = []
+    failed_ids = []
+    for interaction_id, inline_html, codec, data in rows:
+        try:
+            html = decompress_html(codec, data) if data is not None else inline_html
+            extracted = parse_response_html(html)
+        except Exception:
+            failed_ids.append(interaction_id)
+            continue
+        results.append((
+            interaction_id,
+            extracted['text'],
+            json.dumps(extracted['citations']),
+            json.dumps(extracted['code_blocks']),
+            json.dumps(extracted['tables']),
+        ))
+    return results, failed_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate extracted fields from stored response HTML")
+    parser.add_argument('--db', default='bing_chat_data.db', help="database to reprocess")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--batch-size', type=int, default=500, help="rows per worker task and transaction")
+    parser.add_argument('--stale-only', action='store_true',
+                        help="skip rows already processed by this extractor version")
+    args = parser.parse_args()
+
+    from data_processor import DataProcessor
+    from logging_setup import setup_logging
+
+    setup_logging()
+    with DataProcessor(args.db) as processor:
+        report = processor.reextract(workers=args.workers, batch_size=args.batch_size,
+                                     stale_only=args.stale_only)
+    if report is None:
+        raise SystemExit(1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
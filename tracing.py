@@ -0,0 +1,67 @@
+"""Lightweight nested timing spans for finding where scraping time goes"""
+import functools
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class SpanTracer:
+    """
+    Records nested spans with a monotonic clock.
+
+    A span opened while no other span is open starts a new trace; spans
+    opened inside it share its trace_id and point at their parent. Finished
+    spans accumulate until drain() hands them over for storage.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stack = []
+        self.finished = []
+        self.next_span_id = 0
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        parent = self.stack[-1] if self.stack else None
+        self.next_span_id += 1
+        record = {
+            'trace_id': parent['trace_id'] if parent else uuid.uuid4().hex,
+            'span_id': self.next_span_id,
+            'parent_span_id': parent['span_id'] if parent else None,
+            'name': name,
+            'depth': len(self.stack),
+            'started_at': time.time(),
+        }
+        self.stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record['duration_ms'] = (time.perf_counter() - start) * 1000
+            self.stack.pop()
+            self.finished.append(record)
+
+    def drain(self):
+        """Return and forget the spans finished so far"""
+        spans, self.finished = self.finished, []
+        return spans
+
+
+def traced(name=None):
+    """Method decorator recording a span on self.tracer around every call"""
+    def decorator(method):
+        span_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = getattr(self, 'tracer', None)
+            if tracer is None:
+                return method(self, *args, **kwargs)
+            with tracer.span(span_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator